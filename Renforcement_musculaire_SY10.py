@@ -2,63 +2,60 @@ import numpy as np
 import skfuzzy as fuzz
 import matplotlib.pyplot as plt
 
+from base_regles import BaseRegles
+from calculs_lot import coder_lot
+from normes import S_NORMES, T_NORMES, choisir_norme
+
 
 # Classe des systèmes flous
 class SystemeFlou:
     
-    # fonction à appliquer selon la t-norme choisie
-    functable = {"min": np.fmin.reduce,
-                 "proba": np.prod}
+    # fonction à appliquer deux à deux entre les conditions d'une règle selon la t-norme choisie (voir normes.py)
+    functable = T_NORMES
     
     
-    # initialisation du systeme flou, la t-norme par défaut est min
-    def __init__(self, entrees:list, regles:dict, t_norme:str="min"):
+    # initialisation du systeme flou, la t-norme par défaut est min et la s-norme qui réunit les règles est max
+    # les règles sont soit un dictionnaire {((entrée, label), ...): conclusion} soit une BaseRegles déjà compilée,
+    # defaut est la conclusion des combinaisons de classes floues qu'aucune règle ne couvre
+    def __init__(self, entrees:list, regles, t_norme:str="min", defaut:str=None, s_norme:str="max"):
         
         for entree in entrees:
-            if (not isinstance(entree, Entree_nette)) and (not isinstance(entree, Entree_floue)):
+            if not isinstance(entree, (Entree_nette, Entree_floue, Entree_categorielle)):
                 raise TypeError("La liste des entrées doit contenir des objets de type entrées")
         
-        nombre_de_regles_necessaires = 1
-        for i in entrees:
-            nombre_de_regles_necessaires *= len(i.partition)
-        
-        if len(regles) != nombre_de_regles_necessaires:
-            print(len(regles), nombre_de_regles_necessaires)
-            raise ValueError("Le nombre de règles de votre système ne correspond pas à la partition de vos variables.")
-        
-        self.regles = regles
-        self.t_norme = self.functable[t_norme]
+        # compilation des règles : labels encodés en entiers et vérification que toutes les combinaisons sont couvertes
+        if isinstance(regles, BaseRegles):
+            self.regles = regles
+        else:
+            self.regles = BaseRegles([entree.nom for entree in entrees], [list(entree.partition.keys()) for entree in entrees], regles, defaut)
+        self.t_norme = choisir_norme(self.functable, t_norme)
+        self.s_norme = choisir_norme(S_NORMES, s_norme)
         
         # dictionnaire regroupant toutes les entrées fuzzifiées du systeme
         self.entrees_floues = {variable.nom: variable.entree_floue for variable in entrees}
         
+        # les entrées catégorielles ne sont pas fuzzifiées, on garde seulement leur code
+        self.codes = {variable.nom: variable.entree_nette for variable in entrees if isinstance(variable, Entree_categorielle)}
+        
         
         
     # calcule les degrés d'activation des regles du systeme flou
     def activation_regles(self):
         
-        # initialisation du dictionnaire d'activation des différentes conclusions possibles
-        activations = {conclusion: 0 for conclusion in self.regles.values()}
+        # degrés d'appartenance de chaque entrée dans l'ordre des labels de la base de règles, ou code des entrées catégorielles
+        # (les degrés et les codes peuvent etre des tableaux, un par partie du corps par exemple, et se diffusent entre entrées)
+        degres = []
+        for nom, labels in zip(self.regles.noms, self.regles.labels):
+            if nom in self.codes:
+                degres.append(self.codes[nom])
+            else:
+                degres.append(np.stack([self.entrees_floues[nom][label] for label in labels], axis=-1))
         
-        # pour chaque regle dans le dictionnaire de règles
-        for conditions, conclusion in self.regles.items():
-            
-            # calcule les degrés d'appartenance pour toutes les conditions de la règle
-            #initialisation de la table contenant les degrés d'appartenance des classes floues des conditions
-            degres = []
-            # pour chaque condition de la regles (minimum 2) de la forme (entrée, classe floue de l'entrée)
-            for entree, classe_floue in conditions:
-                # on ajoute le degré d'appartenance de la condition à la table des degrés
-                degres.append(self.entrees_floues[entree][classe_floue])
-            
-            # calcul du degré d'activation de la regle avec la t-norme du systeme flou
-            activation = self.t_norme(degres)
-            
-            # max entre la valeur précédente d'activation de la conclusion et la nouvelle ~= la max-union des conclusions floues
-            activations[conclusion] = max(activations[conclusion], activation)
+        # t-norme entre les conditions de chaque règle qui se déclenche puis s-norme des règles de meme conclusion
+        activations = self.regles.activer(degres, self.t_norme, categorielles=self.codes, s_norme=self.s_norme)
         
         # retourne l'activation de chaque conclusion possible aux regles dans un dictionnaire {conclusion: degré d'activation}
-        return activations
+        return {conclusion: activations[..., k][()] for k, conclusion in enumerate(self.regles.conclusions)}
     
     def sortie_floue_non_normalisée(self, nom:str):
         sortie_initiale = self.activation_regles()
@@ -90,11 +87,14 @@ class Entree_nette:
     
     # univers de la forme (x1, x2, pas)
     # partition est un dictonnaire de la forme {label: [x1, x2, x3, x4]} où les x sont les coordonnées des trapezes en notation de Kaufmann
-    # valeur pas nécessairement donnée en initialisation
+    # valeur pas nécessairement donnée en initialisation, ce peut etre un tableau de valeurs (une par partie du corps par exemple)
     def __init__(self, nom:str, univers:list, partition:dict, valeur=None):
         self.nom = nom
         self.univers = np.linspace(*univers)
         
+        # coordonnées des trapèzes telles que données, pour pouvoir ré-exporter ou ajuster la partition
+        self.trapezes = {str(label): list(coordonnees) for label, coordonnees in partition.items()}
+
         # partition floue de l'univers de la variable
         self.partition = {}
         for label in partition.keys():
@@ -169,6 +169,7 @@ class Entree_floue:
         return self._entree_floue
     
     # faut donner les degrés d'appartenance dans le meme ordre que la definition de la partition floue!
+    # chaque degré peut etre un tableau (un degré par partie du corps), l'entrée représente alors toutes les parties à la fois
     @entree_floue.setter
     def entree_floue(self, valeur:list):
         i = 0
@@ -180,12 +181,12 @@ class Entree_floue:
     def normaliser(self):
         # on met toutes les hauteurs des classes floues activées dans une liste pour avoir la hauteur max
         valeurs = [degre_appartenance for degre_appartenance in self._entree_floue.values()]
-        hauteur_max = max(valeurs)
+        hauteur_max = np.max(valeurs, axis=0)
         # On évite la division par zéro
-        if hauteur_max > 0:
+        if np.all(hauteur_max > 0):
             for classe_floue in self._entree_floue:
                 # on divise chaque degré d'appartenance par la hauteur max pour normaliser
-                self._entree_floue[classe_floue] /= hauteur_max
+                self._entree_floue[classe_floue] = self._entree_floue[classe_floue] / hauteur_max
         else:
             raise ValueError("Attention : Les valeurs des degrés d'appartenance sont toutes nulles. Aucune normalisation effectuée.")
     
@@ -205,12 +206,49 @@ class Entree_floue:
             i += 1
         print()
         
-        if denominateur > 0:
+        if np.all(denominateur > 0):
             return numerateur / denominateur
         else:
             raise ValueError("Attention : Les valeurs des degrés d'appartenance sont toutes nulles. Aucune normalisation effectuée.")
     
     
+
+##########################################################################################################################################
+
+
+
+# Classe pour les entrées catégorielles (génétique notée de 0 à 4, répondance au dopage de 0 à 3...)
+# chaque code entier correspond directement à une classe floue, l'entrée floue est un singleton (1 pour la classe du code, 0 ailleurs)
+# donc pas besoin de trapèzes ni de fuzzification, les systemes flous sélectionnent directement les règles de la classe du code
+class Entree_categorielle:
+    
+    # partition est la liste des labels dans l'ordre des codes (le premier label a le code 0)
+    def __init__(self, nom:str, partition:list, valeur:int=None):
+        self.nom = nom
+        self.partition = {str(classe_floue): code for code, classe_floue in enumerate(partition)}
+        
+        if valeur is not None:
+            self.entree_nette = valeur
+    
+    # vérifie des codes (un entier ou un tableau) et les retourne en entiers, un code qui n'est pas un entier
+    # de la partition lève une erreur au lieu de donner des degrés d'appartenance interpolés
+    def coder(self, valeurs):
+        return coder_lot(self.nom, valeurs, len(self.partition))
+    
+    @property
+    def entree_nette(self):
+        return self._entree_nette
+    
+    @property
+    def entree_floue(self):
+        return {classe_floue: (self._entree_nette == code) * 1 for classe_floue, code in self.partition.items()}
+    
+    # un code ou un tableau de codes (un par partie du corps par exemple)
+    @entree_nette.setter
+    def entree_nette(self, valeur):
+        self._entree_nette = self.coder(valeur)[()]
+    
+    
     
 ##########################################################################################################################################
 ##########################################################################################################################################
@@ -305,12 +343,13 @@ def calculer_macronutriments(calories):
 
 
 
-def generer_programme(intensites_reelles):
+# intensites_reelles : {partie: intensité} pour n'importe quel ensemble de parties (groupes musculaires)
+# jours_max : nombre de jours du programme, seances_max : nombre maximum de séances par partie
+def generer_programme(intensites_reelles, jours_max:int=6, seances_max:int=2):
     # Classement des parties du corps par intensité décroissante
     parties_tries = sorted(intensites_reelles.items(), key=lambda x: x[1], reverse=True)
     programme = []
     jours_utilises = 0
-    jours_max = 6  # Limiter à 6 jours d'entraînement
 
     # Garder une trace du nombre de séances par partie
     parties_entrainees = {partie: 0 for partie in intensites_reelles}
@@ -319,7 +358,7 @@ def generer_programme(intensites_reelles):
         ajouté = False
         for partie, intensite in parties_tries:
             # Vérifier si la partie peut être entraînée
-            if parties_entrainees[partie] < 2 and jours_utilises < jours_max:
+            if parties_entrainees[partie] < seances_max and jours_utilises < jours_max:
                 if intensite > 20:
                     programme.append(f"Séance {partie} (très intense)")
                 elif intensite > 15:
@@ -385,23 +424,13 @@ def entrees_regles():
     objectif_mg = Entree_nette("Objectif MG", (0.07, 0.25, 1000), mg_partition)
     
     # Variable génétique d'une partie du corps (à quel point il gagne du muscle en l'entrainant)
-    genetique_partition = {
-        "Mauvaise": [0, 0, 0, 0],
-        "Point faible": [1, 1, 1, 1],
-        "Normal": [2, 2, 2, 2],
-        "Point fort": [3, 3, 3, 3],
-        "Excellente": [4, 4, 4, 4]
-    }
-    genetique = Entree_nette("Génétique", (0, 4, 5), genetique_partition)
+    # notée de 0 à 4, chaque note est une classe floue
+    genetique_partition = ["Mauvaise", "Point faible", "Normal", "Point fort", "Excellente"]
+    genetique = Entree_categorielle("Génétique", genetique_partition)
     
     # Variable répondance au dopage
-    dopage_impact_partition = {
-        "Aucun impact": [0, 0, 0, 0],
-        "Peu répondant": [1, 1, 1, 1],
-        "Répondant": [2, 2, 2, 2],
-        "Très répondant": [3, 3, 3, 3]
-    }
-    dopage_impact = Entree_nette("Impact du dopage", (0, 3, 4), dopage_impact_partition)
+    dopage_impact_partition = ["Aucun impact", "Peu répondant", "Répondant", "Très répondant"]
+    dopage_impact = Entree_categorielle("Impact du dopage", dopage_impact_partition)
     
     # Variable sant d'une partie du corps 0% étant le max et 100% le min
     sante_partition = {
@@ -693,19 +722,21 @@ def main():
     ###
     '''
     
-    objectifs_fuzzifies = {}
-    for partie_du_corps, valeur in objectifs_nets.items():
-        d["Objectif Musculaire"].entree_nette = valeur
-        a = Entree_floue("Objectif", list(d["Objectif Musculaire"].entree_floue.keys()), list(d["Objectif Musculaire"].entree_floue.values()))
-        a.normaliser()
-        objectifs_fuzzifies[partie_du_corps] = a
+    # Toutes les parties du corps sont traitées d'un coup : les entrées prennent un tableau de valeurs
+    # (une par partie, dans l'ordre de parties) et les degrés d'appartenance sont des tableaux de meme taille
+    parties = list(objectifs_nets)
+    
+    d["Objectif Musculaire"].entree_nette = np.array([objectifs_nets[partie] for partie in parties])
+    objectifs_parties = Entree_floue("Objectif", list(d["Objectif Musculaire"].entree_floue.keys()), list(d["Objectif Musculaire"].entree_floue.values()))
+    objectifs_parties.normaliser()
+    objectifs_fuzzifies = {partie: {label: degres[i] for label, degres in objectifs_parties.entree_floue.items()} for i, partie in enumerate(parties)}
     
     print("\nFuzzification des objectifs musculaires :")
     for partie, objectif in objectifs_fuzzifies.items():
-        print(f"{partie.capitalize()} : {objectif.entree_floue}")
+        print(f"{partie.capitalize()} : {objectif}")
     
     ordre_priorite = ["gros gain", "gain modéré", "inchangé", "perte"]
-    objectif_musculaire_maximum = trouver_maximum_prioritaire_alpha({partie: obj.entree_floue for partie, obj in objectifs_fuzzifies.items()}, ordre_priorite, alpha=0.3)
+    objectif_musculaire_maximum = trouver_maximum_prioritaire_alpha(objectifs_fuzzifies, ordre_priorite, alpha=0.3)
     
     print(f"Objectif musculaire maximum : {objectif_musculaire_maximum}")
     
@@ -787,10 +818,11 @@ def main():
     ###
     '''
     
+    # sans dopage l'impact est "Aucun impact" (code 0)
     if dopage_OK:
         d["Impact du dopage"].entree_nette = repondance
     else:
-        d["Impact du dopage"] = Entree_floue("Impact du dopage", ["Aucun impact", "Peu répondant", "Répondant", "Très répondant"], [1, 0, 0, 0])
+        d["Impact du dopage"].entree_nette = 0
     
     print("\nSystème Dopage terminé avec succès.")
     
@@ -812,17 +844,16 @@ def main():
     ###
     '''
 
-    intensites_nec_1, intensites_nec_2 = {}, {}
-    for partie_du_corps, valeur in genetiques.items():
-        d["Génétique"].entree_nette = valeur
-        sys = SystemeFlou([d["Génétique"], objectifs_fuzzifies[partie_du_corps]], d["regles SIF Intensité Nécessaire 1"])
-        intensites_nec_1[partie_du_corps] = sys.sortie_floue_non_normalisée("Intensité nécessaire intermédiaire")
-        sys2 = SystemeFlou([d["Impact du dopage"], intensites_nec_1[partie_du_corps]], d["regles SIF Intensité Nécessaire 2"])
-        intensites_nec_2[partie_du_corps] = sys2.sortie_floue_normalisée("Intensité nécessaire")
+    # un seul passage de chaque SIF pour toutes les parties, l'impact du dopage est commun à toutes
+    d["Génétique"].entree_nette = np.array([genetiques[partie] for partie in parties])
+    sys = SystemeFlou([d["Génétique"], objectifs_parties], d["regles SIF Intensité Nécessaire 1"])
+    intensites_nec_1 = sys.sortie_floue_non_normalisée("Intensité nécessaire intermédiaire")
+    sys2 = SystemeFlou([d["Impact du dopage"], intensites_nec_1], d["regles SIF Intensité Nécessaire 2"])
+    intensites_nec_2 = sys2.sortie_floue_normalisée("Intensité nécessaire")
     
     print("\nSystème Intensité necessaire terminé avec succès.")
-    for partie, intensite_fuzz in intensites_nec_2.items():
-        print(f"{partie}: {intensite_fuzz.entree_floue}")
+    for i, partie in enumerate(parties):
+        print(f"{partie}: { {label: degres[i] for label, degres in intensites_nec_2.entree_floue.items()} }")
             
             
     
@@ -842,15 +873,13 @@ def main():
     ###
     '''
 
-    intensites_pos = {}
-    for partie_du_corps, valeur in santes.items():
-        d["Santé"].entree_nette = valeur
-        sys = SystemeFlou([d["Santé"], d["Apports caloriques"]], d["regles SIF Intensité Possible"])
-        intensites_pos[partie_du_corps] = sys.sortie_floue_normalisée("Intensité possible")
+    d["Santé"].entree_nette = np.array([santes[partie] for partie in parties])
+    sys = SystemeFlou([d["Santé"], d["Apports caloriques"]], d["regles SIF Intensité Possible"])
+    intensites_pos = sys.sortie_floue_normalisée("Intensité possible")
     
     print("\nSystème Intensité possible terminé avec succès.")
-    for partie, intensite_fuzz in intensites_pos.items():
-        print(f"{partie}: {intensite_fuzz.entree_floue}")
+    for i, partie in enumerate(parties):
+        print(f"{partie}: { {label: degres[i] for label, degres in intensites_pos.entree_floue.items()} }")
 
     
     ############################################################# INTENSITE REELLE #############################################################
@@ -858,13 +887,11 @@ def main():
     print("Bienvenue dans le système flou Intensité réelle.")
     
     # Calcul des intensités réelles
-    intensites_reelles = {}
-    for partie_du_corps in intensites_nec_2:
-        # Utilisation de la méthode defuzzification directement
-        barycentre_pos = intensites_pos[partie_du_corps].defuzzification([20, 25, 30, 15, 5, 10], gamma=1)
-        barycentre_nec = intensites_nec_2[partie_du_corps].defuzzification([5, 10, 15, 20, 25, 30], gamma=1)
-        # Intensité réelle
-        intensites_reelles[partie_du_corps] = min(barycentre_pos, barycentre_nec)
+    # Utilisation de la méthode defuzzification directement, elle donne un barycentre par partie
+    barycentres_pos = intensites_pos.defuzzification([20, 25, 30, 15, 5, 10], gamma=1)
+    barycentres_nec = intensites_nec_2.defuzzification([5, 10, 15, 20, 25, 30], gamma=1)
+    # Intensité réelle
+    intensites_reelles = {partie: float(intensite) for partie, intensite in zip(parties, np.minimum(barycentres_pos, barycentres_nec))}
 
     # Affichage des intensités réelles
     print("\nIntensités réelles pour chaque partie du corps :")
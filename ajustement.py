@@ -0,0 +1,216 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Renforcement_musculaire_SY10 import Entree_nette
+from moteur_vectorise import MoteurVectorise
+
+
+# Ajustement des trapèzes des partitions (entrees_regles) et des valeurs de régression des défuzzifications
+# sur des résultats historiques labellisés. A chaque itération toute une population de jeux de paramètres
+# est évaluée sur tout le jeu de données en une passe vectorisée (candidats x clients) du moteur,
+# l'optimiseur est une méthode de l'entropie croisée qui n'a pas besoin de dérivées
+
+
+# Passage d'un vecteur plat de paramètres (ce que manipule l'optimiseur) aux paramètres du moteur et inversement
+class EspaceParametres:
+
+    # noms : clés de d (trapèzes d'une Entree_nette) ou de MoteurVectorise.regressions (valeurs de régression)
+    def __init__(self, moteur:MoteurVectorise, noms:list):
+        self.noms = list(noms)
+        self.formes = {}
+        self.labels = {}
+        initial, ecarts, bornes = [], [], []
+
+        for nom in self.noms:
+            if nom in moteur.regressions:
+                valeurs = np.asarray(getattr(moteur, moteur.regressions[nom]), dtype=float)
+                etendue = np.ptp(valeurs) or 1.0
+                initial.append(valeurs)
+                ecarts.append(np.full(valeurs.shape, 0.1 * etendue))
+                bornes.append(np.full(valeurs.shape + (2,), [-np.inf, np.inf]))
+            elif isinstance(moteur.d.get(nom), Entree_nette):
+                entree = moteur.d[nom]
+                valeurs = np.array(list(entree.trapezes.values()), dtype=float)
+                self.labels[nom] = list(entree.trapezes)
+                # les trapèzes peuvent déborder de l'univers (ex: "sec" commence à 0.06), on garde ce débordement possible
+                bas, haut = min(entree.univers[0], valeurs.min()), max(entree.univers[-1], valeurs.max())
+                initial.append(valeurs)
+                ecarts.append(np.full(valeurs.shape, 0.05 * (entree.univers[-1] - entree.univers[0])))
+                bornes.append(np.full(valeurs.shape + (2,), [bas, haut]))
+            else:
+                raise KeyError(f"Paramètre inconnu : {nom}")
+            self.formes[nom] = valeurs.shape
+
+        self.initial = np.concatenate([x.ravel() for x in initial])
+        self.ecarts_initiaux = np.concatenate([x.ravel() for x in ecarts])
+        self.bornes = np.concatenate([x.reshape(-1, 2) for x in bornes])
+
+    # découpe des vecteurs (..., dimension) en blocs {nom: (..., forme du paramètre)}
+    def _blocs(self, vecteurs):
+        blocs, debut = {}, 0
+        for nom in self.noms:
+            taille = int(np.prod(self.formes[nom]))
+            blocs[nom] = vecteurs[..., debut:debut + taille].reshape(vecteurs.shape[:-1] + self.formes[nom])
+            debut += taille
+        return blocs
+
+    # ramène des vecteurs candidats dans l'espace admissible : bornes respectées et a <= b <= c <= d pour chaque trapèze
+    def projeter(self, vecteurs):
+        vecteurs = np.clip(vecteurs, self.bornes[:, 0], self.bornes[:, 1])
+        blocs = self._blocs(vecteurs)
+        for nom in self.labels:
+            blocs[nom] = np.sort(blocs[nom], axis=-1)
+        return np.concatenate([blocs[nom].reshape(vecteurs.shape[:-1] + (-1,)) for nom in self.noms], axis=-1)
+
+    # vecteurs (candidats, dimension) -> paramètres du moteur, avec un axe pour les clients après celui des candidats
+    def vers_parametres(self, vecteurs):
+        return {nom: bloc[:, None] for nom, bloc in self._blocs(vecteurs).items()}
+
+    # vecteur (dimension,) -> modèle au format des partitions de entrees_regles() et des listes de valeurs de régression
+    def exporter(self, vecteur):
+        modele = {}
+        for nom, bloc in self._blocs(np.asarray(vecteur, dtype=float)).items():
+            if nom in self.labels:
+                modele[nom] = {label: [float(x) for x in trapeze] for label, trapeze in zip(self.labels[nom], bloc)}
+            else:
+                modele[nom] = [float(x) for x in bloc]
+        return modele
+
+
+
+def moteur_depuis_modele(modele:dict, moteur:MoteurVectorise=None):
+    """
+    Construit un moteur utilisant un modèle exporté par EspaceParametres.exporter (ou Ajustement.ajuster).
+
+    Args:
+        modele (dict): Partitions {label: [x1, x2, x3, x4]} et valeurs de régression à remplacer.
+        moteur (MoteurVectorise): Moteur de départ (celui de l'ajustement), dont on garde les entrées, les règles,
+            les autres valeurs de régression, les parties et le programme. Celui de entrees_regles() par défaut.
+
+    Returns:
+        MoteurVectorise: Le moteur avec les partitions et valeurs du modèle.
+    """
+    moteur = MoteurVectorise() if moteur is None else moteur
+    d = dict(moteur.d)
+    valeurs_regression = {nom: getattr(moteur, attribut) for nom, attribut in MoteurVectorise.regressions.items()}
+    for nom, valeur in modele.items():
+        if nom in MoteurVectorise.regressions:
+            valeurs_regression[nom] = valeur
+        else:
+            entree = d[nom]
+            d[nom] = Entree_nette(entree.nom, (entree.univers[0], entree.univers[-1], len(entree.univers)), valeur)
+    return MoteurVectorise(d, valeurs_regression, parties=moteur.parties, jours=moteur.jours, seances_max=moteur.seances_max)
+
+
+
+# contexte des processus de calcul, initialisé une fois par processus
+_ajustement_processus = None
+
+def _initialiser_processus(ajustement):
+    global _ajustement_processus
+    _ajustement_processus = ajustement
+
+def _couts_processus(vecteurs):
+    return _ajustement_processus.couts(vecteurs)
+
+
+
+class Ajustement:
+
+    # profils : entrées de MoteurVectorise.evaluer pour les N clients de l'historique
+    # cibles : résultats observés, de meme forme que les sorties du moteur (ex: "Apports caloriques" (N,),
+    # "Intensités réelles" (N, parties)), NaN pour une valeur non observée
+    # noms : paramètres à ajuster, voir EspaceParametres
+    # penalite : cout d'une valeur observée que le candidat ne sait pas calculer (DANGER, hors univers...)
+    def __init__(self, profils:dict, cibles:dict, noms=("IMC", "Apports caloriques", "valeurs nutrition"),
+                 moteur:MoteurVectorise=None, penalite:float=4.0):
+        self.moteur = MoteurVectorise() if moteur is None else moteur
+        self.espace = EspaceParametres(self.moteur, noms)
+        self.penalite = penalite
+
+        # axe des candidats devant celui des clients
+        self.profils = {cle: np.asarray(valeur)[None] for cle, valeur in profils.items()}
+        self.cibles = {nom: np.asarray(valeur, dtype=float) for nom, valeur in cibles.items()}
+        self.nombre_observations = sum(int(np.isfinite(valeur).sum()) for valeur in self.cibles.values())
+        if self.nombre_observations == 0:
+            raise ValueError("Aucune valeur observée dans les cibles.")
+
+        # les erreurs sont rapportées à l'écart type de chaque cible pour pouvoir les additionner
+        self.echelles = {nom: float(np.nanstd(valeur)) or 1.0 for nom, valeur in self.cibles.items()}
+
+    # cout (erreur quadratique moyenne normalisée) de chaque vecteur candidat (candidats, dimension) en une passe
+    def couts(self, vecteurs):
+        resultats = self.moteur.evaluer(self.profils, self.espace.vers_parametres(vecteurs))
+        total = np.zeros(len(vecteurs))
+        for nom, observe in self.cibles.items():
+            predit = resultats[nom]
+            erreurs = np.where(np.isfinite(predit), ((predit - observe) / self.echelles[nom]) ** 2, self.penalite)
+            erreurs = np.where(np.isfinite(observe), erreurs, 0.0)
+            total += erreurs.reshape(len(vecteurs), -1).sum(axis=1)
+        return total / self.nombre_observations
+
+    # évalue une population par blocs de candidats, pour borner la mémoire, éventuellement répartis sur plusieurs processus
+    def _couts_population(self, vecteurs, taille_bloc:int, executeur=None):
+        blocs = [vecteurs[i:i + taille_bloc] for i in range(0, len(vecteurs), taille_bloc)]
+        if executeur is None:
+            return np.concatenate([self.couts(bloc) for bloc in blocs])
+        return np.concatenate(list(executeur.map(_couts_processus, blocs)))
+
+    def ajuster(self, n_candidats:int=64, n_iterations:int=30, fraction_elite:float=0.2, lissage:float=0.7,
+                taille_bloc:int=16, n_processus:int=1, graine=None):
+        """
+        Ajuste les paramètres par la méthode de l'entropie croisée.
+
+        Args:
+            n_candidats (int): Taille de la population évaluée à chaque itération.
+            n_iterations (int): Nombre d'itérations.
+            fraction_elite (float): Part des meilleurs candidats qui définit la population suivante.
+            lissage (float): Poids des écarts des élites face aux écarts précédents.
+            taille_bloc (int): Nombre de candidats évalués ensemble en une passe du moteur.
+            n_processus (int): Nombre de processus d'évaluation des blocs.
+            graine (int): Graine du générateur aléatoire.
+
+        Returns:
+            dict: "modele" (au format des partitions de entrees_regles(), à charger avec
+            moteur_depuis_modele(modele, self.moteur)), "cout", "cout initial" et "historique".
+        """
+        rng = np.random.default_rng(graine)
+        espace = self.espace
+        n_elite = max(2, int(fraction_elite * n_candidats))
+
+        moyenne = espace.initial.copy()
+        ecarts = espace.ecarts_initiaux.copy()
+        meilleur = espace.projeter(moyenne[None])[0]
+        meilleur_cout = float(self.couts(meilleur[None])[0])
+        historique = [meilleur_cout]
+
+        executeur = None
+        if n_processus > 1:
+            executeur = ProcessPoolExecutor(n_processus, initializer=_initialiser_processus, initargs=(self,))
+        try:
+            for _ in range(n_iterations):
+                candidats = moyenne + ecarts * rng.standard_normal((n_candidats, len(moyenne)))
+                # le meilleur candidat connu reste dans la population
+                candidats[0] = meilleur
+                candidats = espace.projeter(candidats)
+
+                couts = self._couts_population(candidats, taille_bloc, executeur)
+                classement = np.argsort(couts)
+                if couts[classement[0]] < meilleur_cout:
+                    meilleur, meilleur_cout = candidats[classement[0]], float(couts[classement[0]])
+
+                elites = candidats[classement[:n_elite]]
+                moyenne = elites.mean(axis=0)
+                ecarts = lissage * elites.std(axis=0) + (1 - lissage) * ecarts
+                historique.append(meilleur_cout)
+        finally:
+            if executeur is not None:
+                executeur.shutdown()
+
+        return {
+            "modele": espace.exporter(meilleur),
+            "cout": meilleur_cout,
+            "cout initial": historique[0],
+            "historique": historique
+        }
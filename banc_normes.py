@@ -0,0 +1,124 @@
+import time
+
+import numpy as np
+
+from Renforcement_musculaire_SY10 import entrees_regles
+from moteur_vectorise import MoteurVectorise, echantillonner_profils
+from normes import S_NORMES, T_NORMES
+
+
+# Banc des t-normes et s-normes de normes.py : débit de chaque noyau seul sur des matrices d'activations de règles,
+# puis débit et écart au couple min/max de toute la chaine du moteur vectorisé quand tous les SIF utilisent une norme
+
+
+# meilleur temps sur plusieurs répétitions, en secondes
+def _chronometrer(fonction, repetitions:int):
+    meilleur = np.inf
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur
+
+
+def banc_noyaux(lignes:int=100000, regles:int=64, conclusions:int=6, repetitions:int=5, graine=None):
+    """
+    Mesure le débit de chaque noyau sur une matrice d'activations aléatoire (lignes, règles).
+
+    Args:
+        lignes (int): Nombre de lignes du lot.
+        regles (int): Nombre de règles qui se déclenchent.
+        conclusions (int): Nombre de segments de règles réunis par les s-normes.
+        repetitions (int): Nombre de mesures, la meilleure est gardée.
+        graine (int): Graine du générateur aléatoire.
+
+    Returns:
+        dict: {"t-normes": {nom: activations par seconde}, "s-normes": {nom: activations par seconde}}.
+    """
+    rng = np.random.default_rng(graine)
+    a = rng.random((lignes, regles))
+    b = rng.random((lignes, regles))
+    debuts = np.linspace(0, regles, conclusions, endpoint=False).astype(np.intp)
+
+    rapport = {"t-normes": {}, "s-normes": {}}
+    for nom, t_norme in T_NORMES.items():
+        if nom == "proba":
+            continue
+        rapport["t-normes"][nom] = a.size / _chronometrer(lambda: t_norme(a, b), repetitions)
+    for nom, s_norme in S_NORMES.items():
+        rapport["s-normes"][nom] = a.size / _chronometrer(lambda: s_norme(a, debuts), repetitions)
+    return rapport
+
+
+def moteur_normes(t_norme:str="min", s_norme:str="max"):
+    """
+    Moteur de entrees_regles() dont tous les SIF utilisent les memes normes.
+
+    Args:
+        t_norme (str): Nom de la t-norme dans T_NORMES.
+        s_norme (str): Nom de la s-norme dans S_NORMES.
+
+    Returns:
+        MoteurVectorise: Le moteur.
+    """
+    d = entrees_regles()
+    d["normes"] = {cle: {"t-norme": t_norme, "s-norme": s_norme} for cle in d if cle.startswith("regles")}
+    return MoteurVectorise(d)
+
+
+def banc_moteur(n:int=20000, repetitions:int=3, graine=None):
+    """
+    Mesure le débit de la chaine complète pour chaque couple de normes et son écart au couple min/max.
+
+    Args:
+        n (int): Nombre de profils évalués.
+        repetitions (int): Nombre de mesures, la meilleure est gardée.
+        graine (int): Graine du générateur aléatoire.
+
+    Returns:
+        dict: {(t-norme, s-norme): {"profils par seconde", "écart apports max", "écart intensités max",
+        "programmes identiques"}}, les écarts étant pris sur les profils valides pour les deux moteurs.
+    """
+    reference = moteur_normes()
+    profils = echantillonner_profils(n, reference, graine)
+    attendu = reference.evaluer(profils)
+
+    rapport = {}
+    for t_norme in T_NORMES:
+        if t_norme == "proba":
+            continue
+        for s_norme in S_NORMES:
+            moteur = reference if (t_norme, s_norme) == ("min", "max") else moteur_normes(t_norme, s_norme)
+            resultats = moteur.evaluer(profils)
+            duree = _chronometrer(lambda: moteur.evaluer(profils), repetitions)
+
+            valides = attendu["Valide"] & resultats["Valide"]
+            memes_programmes = (attendu["Programme parties"] == resultats["Programme parties"]).all(axis=-1) & \
+                               (attendu["Programme niveaux"] == resultats["Programme niveaux"]).all(axis=-1)
+            rapport[(t_norme, s_norme)] = {
+                "profils par seconde": n / duree,
+                "écart apports max": float(np.abs(attendu["Apports caloriques"] - resultats["Apports caloriques"])[valides].max(initial=0.0)),
+                "écart intensités max": float(np.abs(attendu["Intensités réelles"] - resultats["Intensités réelles"])[valides].max(initial=0.0)),
+                "programmes identiques": float(memes_programmes[valides].mean()) if valides.any() else 1.0,
+            }
+    return rapport
+
+
+
+##########################################################################################################################################
+
+
+
+if __name__ == "__main__":
+    noyaux = banc_noyaux(graine=0)
+    for famille, debits in noyaux.items():
+        print(famille)
+        for nom, debit in debits.items():
+            print(f"    {nom:<20} {debit / 1e6:8.1f} M activations/s")
+
+    print("\nchaine complète (tous les SIF)")
+    for (t_norme, s_norme), mesures in banc_moteur(graine=0).items():
+        print(f"    {t_norme:<12} {s_norme:<20} {mesures['profils par seconde']:10.0f} profils/s"
+              f"    écart apports {mesures['écart apports max']:7.1f} kcal"
+              f"    écart intensités {mesures['écart intensités max']:.3f}"
+              f"    programmes identiques {mesures['programmes identiques']:.1%}")
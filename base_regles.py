@@ -0,0 +1,387 @@
+import itertools
+
+import numpy as np
+
+from normes import s_norme_max
+
+
+# Base de règles compilée pour les SIF à 2 entrées ou plus : les labels sont encodés en entiers, une règle n'a pas
+# besoin de préciser toutes ses entrées (joker) et une conclusion par défaut peut couvrir les combinaisons sans règle.
+# On ne stocke donc que les règles écrites, et l'évaluation ne calcule que les règles qui se déclenchent
+
+
+# label d'une condition qui accepte n'importe quelle classe floue de l'entrée (équivalent à ne pas citer l'entrée)
+JOKER = "*"
+
+# indice d'un joker dans le tableau des antécédents
+INDICE_JOKER = -1
+
+
+class BaseRegles:
+
+    # noms : noms des entrées, labels : liste des labels de chaque entrée (dans l'ordre de leur partition)
+    # regles : dictionnaire au format de entrees_regles() {((entrée, label), ...): conclusion}, où une entrée
+    # absente des conditions ou de label JOKER accepte toutes ses classes floues
+    # defaut : conclusion des combinaisons de classes floues qu'aucune règle ne couvre
+    def __init__(self, noms:list, labels:list, regles:dict, defaut:str=None):
+        self.noms = list(noms)
+        self.labels = [[str(label) for label in labels_entree] for labels_entree in labels]
+
+        # conclusions dans l'ordre d'apparition, comme les clés du dictionnaire rendu par SystemeFlou.activation_regles
+        self.conclusions = list(dict.fromkeys(regles.values()))
+
+        antecedents = np.full((len(regles), len(self.noms)), INDICE_JOKER, dtype=np.int16)
+        conclusions = np.empty(len(regles), dtype=np.intp)
+        for r, (conditions, conclusion) in enumerate(regles.items()):
+            for entree, label in conditions:
+                if entree not in self.noms:
+                    raise ValueError(f"La règle {conditions} porte sur une entrée inconnue : {entree}")
+                i = self.noms.index(entree)
+                if label == JOKER:
+                    continue
+                if str(label) not in self.labels[i]:
+                    raise ValueError(f"La règle {conditions} utilise un label inconnu pour {entree} : {label}")
+                antecedents[r, i] = self.labels[i].index(str(label))
+            conclusions[r] = self.conclusions.index(conclusion)
+
+        self._compiler(antecedents, conclusions, defaut)
+
+    @classmethod
+    def depuis_tableaux(cls, noms:list, labels:list, antecedents, conclusions_regles, conclusions:list, defaut:str=None):
+        """
+        Construit une base directement à partir de règles déjà encodées en entiers.
+
+        Args:
+            noms (list): Noms des entrées.
+            labels (list): Labels de chaque entrée.
+            antecedents (array): (règles, entrées) indice du label de chaque condition, INDICE_JOKER pour un joker.
+            conclusions_regles (array): (règles,) indice de la conclusion de chaque règle dans conclusions.
+            conclusions (list): Labels des conclusions.
+            defaut (str): Conclusion des combinaisons qu'aucune règle ne couvre.
+
+        Returns:
+            BaseRegles: La base compilée.
+        """
+        base = cls.__new__(cls)
+        base.noms = list(noms)
+        base.labels = [[str(label) for label in labels_entree] for labels_entree in labels]
+        base.conclusions = list(conclusions)
+        base._compiler(np.asarray(antecedents, dtype=np.int16), np.asarray(conclusions_regles, dtype=np.intp), defaut)
+        return base
+
+    # vérifie la complétude, ajoute les règles par défaut et range les règles par conclusion
+    def _compiler(self, antecedents, conclusions, defaut):
+        tailles = [len(labels) for labels in self.labels]
+        if ((antecedents < INDICE_JOKER) | (antecedents >= np.array(tailles, dtype=np.int16))).any():
+            raise ValueError("Les antécédents des règles doivent etre des indices de labels ou des jokers.")
+
+        # groupes de labels utilisés par les règles par défaut, leur indice suit ceux des labels de l'entrée
+        self.groupes = [[] for _ in self.noms]
+
+        trous = self._non_couvertes(antecedents, np.arange(len(antecedents)), 0, ())
+        if trous:
+            if defaut is None:
+                exemple = tuple((nom, self._nom_condition(i, j)) for i, (nom, j) in enumerate(zip(self.noms, trous[0])))
+                raise ValueError(f"Les règles ne couvrent pas toutes les combinaisons de classes floues, par exemple {exemple}. "
+                                 "Ajoutez des règles ou une conclusion par défaut.")
+            if defaut not in self.conclusions:
+                self.conclusions.append(defaut)
+            antecedents = np.concatenate([antecedents, np.array(trous, dtype=np.int16)])
+            conclusions = np.concatenate([conclusions, np.full(len(trous), self.conclusions.index(defaut))])
+
+        # les règles d'une meme conclusion sont contigues pour l'agrégation par segments
+        ordre = np.argsort(conclusions, kind="stable")
+        self.antecedents = antecedents[ordre]
+        self.conclusions_regles = conclusions[ordre]
+
+        # régions disjointes des règles de chaque conclusion, construites à la première évaluation avec une autre s-norme que le max
+        self._regions = None
+
+    # label, groupe de labels ou joker d'une condition, pour les messages d'erreur
+    def _nom_condition(self, i:int, j:int):
+        if j == INDICE_JOKER:
+            return JOKER
+        if j < len(self.labels[i]):
+            return self.labels[i][j]
+        return "|".join(self.labels[i][k] for k in self.groupes[i][j - len(self.labels[i])])
+
+    # régions (labels ou groupes de labels, jokers pour le reste) de l'espace des entrées à partir de l'entrée dim
+    # qu'aucune des règles ne couvre. Les labels qui ont exactement les memes règles ont les memes trous, ils sont
+    # donc traités ensemble pour ne pas multiplier les règles par défaut
+    def _non_couvertes(self, antecedents, regles, dim:int, prefixe:tuple):
+        n = len(self.noms)
+        if len(regles) == 0:
+            return [prefixe + (INDICE_JOKER,) * (n - dim)]
+        if dim == n or (antecedents[regles, dim:] == INDICE_JOKER).all(axis=1).any():
+            return []
+
+        colonne = antecedents[regles, dim]
+        jokers = regles[colonne == INDICE_JOKER]
+        groupes = {}
+        for label in range(len(self.labels[dim])):
+            groupes.setdefault(tuple(regles[colonne == label]), []).append(label)
+
+        trous = []
+        for specifiques, labels in groupes.items():
+            if len(labels) == len(self.labels[dim]):
+                indice = INDICE_JOKER
+            elif len(labels) == 1:
+                indice = labels[0]
+            else:
+                if labels not in self.groupes[dim]:
+                    self.groupes[dim].append(labels)
+                indice = len(self.labels[dim]) + self.groupes[dim].index(labels)
+            sous_regles = np.concatenate([np.array(specifiques, dtype=regles.dtype), jokers])
+            trous += self._non_couvertes(antecedents, sous_regles, dim + 1, prefixe + (indice,))
+        return trous
+
+    def __len__(self):
+        return len(self.antecedents)
+
+    # (indice étendu de condition, code) -> la condition accepte-t-elle la classe du code, pour les entrées catégorielles
+    def _correspondances(self, i:int):
+        taille = len(self.labels[i])
+        correspond = np.zeros((taille + len(self.groupes[i]) + 1, taille), dtype=bool)
+        correspond[np.arange(taille), np.arange(taille)] = True
+        for k, groupe in enumerate(self.groupes[i]):
+            correspond[taille + k, groupe] = True
+        correspond[INDICE_JOKER] = True
+        return correspond
+
+    def activer(self, degres:list, t_norme=np.minimum, categorielles=(), s_norme=s_norme_max):
+        """
+        Calcule l'activation de chaque conclusion (s-norme des règles) en n'évaluant que les règles qui se déclenchent.
+
+        Un joker prend le degré maximal de l'entrée, ce qui donne exactement le meme résultat que la règle
+        recopiée pour chaque label de l'entrée quand la s-norme est le max. Avec une autre s-norme chaque combinaison
+        de classes floues couverte compte une fois par conclusion, comme dans la base écrite en entier (voir
+        _activer_regions). Une entrée catégorielle est donnée par le code de sa classe : seules les règles de cette
+        classe sont gardées et la condition vaut 1, ce qui ne change rien à la t-norme.
+
+        Args:
+            degres (list): Un tableau (..., labels de l'entrée) par entrée dans l'ordre des noms,
+                ou un tableau (...) de codes entiers valides pour les entrées catégorielles.
+            t_norme (function): T-norme appliquée deux à deux entre les conditions d'une règle (voir normes.py).
+            categorielles (iterable): Noms des entrées données par leur code.
+            s_norme (function): S-norme qui réunit les règles de chaque conclusion (voir normes.py).
+
+        Returns:
+            array: (..., conclusions) les activations, dans l'ordre de conclusions.
+        """
+        categorielles = {i for i, nom in enumerate(self.noms) if nom in categorielles}
+        degres = [np.asarray(degre, dtype=np.intp if i in categorielles else float) for i, degre in enumerate(degres)]
+        if s_norme is not s_norme_max:
+            return self._activer_regions(degres, t_norme, categorielles, s_norme)
+
+        # une règle se déclenche si toutes ses conditions sont activées (NaN compris, pour qu'il se propage),
+        # pour une entrée catégorielle si sa condition accepte un des codes du lot
+        declenchees = np.ones(len(self.antecedents), dtype=bool)
+        correspondances = {}
+        codes_presents = {}
+        for i, degre in enumerate(degres):
+            if i in categorielles:
+                correspondances[i] = self._correspondances(i)
+                codes_presents[i] = np.unique(degre)
+                actifs = correspondances[i][:, codes_presents[i]].any(axis=1)
+            else:
+                actifs = ~(degre.reshape(-1, degre.shape[-1]) <= 0).all(axis=0)
+                actifs = np.append(actifs, [actifs[groupe].any() for groupe in self.groupes[i]] + [actifs.any()])
+            declenchees &= actifs[self.antecedents[:, i]]
+        regles = np.flatnonzero(declenchees)
+
+        forme = np.broadcast_shapes(*[degre.shape if i in categorielles else degre.shape[:-1] for i, degre in enumerate(degres)])
+        activations = np.zeros(forme + (len(self.conclusions),))
+        if len(regles) == 0:
+            return activations
+
+        # avec un seul code dans le lot, les règles gardées sont déjà exactement celles de ce code. Sinon chaque ligne
+        # prend dans une table par combinaison de codes les seules règles de ses codes (colonnes, -1 pour compléter)
+        variables = [i for i in sorted(categorielles) if codes_presents[i].size > 1]
+        conclusions = self.conclusions_regles[regles]
+        if variables:
+            code, colonnes, conclusions = self._regles_par_code(regles, variables, degres, correspondances)
+
+        # degré de chaque condition : les groupes de labels prennent le maximum de leurs labels et le joker
+        # (indice -1) tombe sur la colonne du maximum de l'entrée ajoutée en dernier
+        activation_regles = None
+        for i, degre in enumerate(degres):
+            if i in categorielles:
+                continue
+            indices = self.antecedents[regles, i]
+            if variables:
+                # les colonnes qui complètent la table lisent n'importe quelle condition, elles sont mises à 0 plus bas
+                indices = indices[colonnes][code]
+            # colonnes des groupes et du joker seulement si une des règles gardées en a besoin
+            if (indices == INDICE_JOKER).any() or (indices >= degre.shape[-1]).any():
+                colonnes_degre = [degre] + [degre[..., groupe].max(axis=-1, keepdims=True) for groupe in self.groupes[i]]
+                degre = np.concatenate(colonnes_degre + [degre.max(axis=-1, keepdims=True)], axis=-1)
+            if indices.ndim == 1:
+                conditions = degre[..., indices]
+            else:
+                # indices par ligne : memes nombres de dimensions pour que les deux se diffusent
+                n = len(forme) + 1
+                conditions = np.take_along_axis(degre.reshape((1,) * (n - degre.ndim) + degre.shape),
+                                                indices.reshape((1,) * (n - indices.ndim) + indices.shape), axis=-1)
+            activation_regles = conditions if activation_regles is None else t_norme(activation_regles, conditions)
+
+        # t-norme avec 0 pour les colonnes qui complètent la table, les autres sont inchangées
+        if variables and (colonnes < 0).any():
+            remplies = (colonnes >= 0)[code]
+            activation_regles = remplies.astype(float) if activation_regles is None else np.where(remplies, activation_regles, 0.0)
+        elif activation_regles is None:
+            activation_regles = np.ones(colonnes.shape[1] if variables else len(regles))
+
+        # s-norme des règles de chaque conclusion, par segments de règles contigues
+        debuts = np.flatnonzero(np.r_[True, conclusions[1:] != conclusions[:-1]])
+        activations[..., conclusions[debuts]] = s_norme(np.broadcast_to(activation_regles, forme + activation_regles.shape[-1:]), debuts)
+        return activations
+
+    def _regles_par_code(self, regles, variables:list, degres:list, correspondances:dict):
+        """
+        Table des règles de chaque combinaison de codes des entrées catégorielles variables.
+
+        Returns:
+            tuple: Le code combiné de chaque ligne, la table (combinaisons, colonnes) des positions dans regles
+            (-1 pour compléter) et la conclusion de chaque colonne. Les colonnes d'une meme conclusion sont
+            contigues et dans l'ordre de regles, pour que la s-norme s'applique par segments comme sans table.
+        """
+        tailles = [len(self.labels[i]) for i in variables]
+        code = np.ravel_multi_index(np.broadcast_arrays(*[degres[i] for i in variables]), tailles)
+        combinaisons = np.indices(tailles).reshape(len(variables), -1)
+
+        acceptees = np.ones((combinaisons.shape[1], len(regles)), dtype=bool)
+        for v, i in enumerate(variables):
+            acceptees &= correspondances[i][self.antecedents[regles, i]][:, combinaisons[v]].T
+
+        conclusions_regles = self.conclusions_regles[regles]
+        blocs, conclusions = [], []
+        for conclusion in np.unique(conclusions_regles):
+            positions = [np.flatnonzero(ligne & (conclusions_regles == conclusion)) for ligne in acceptees]
+            longueur = max(len(p) for p in positions)
+            if longueur == 0:
+                continue
+            bloc = np.full((len(positions), longueur), -1, dtype=np.intp)
+            for c, p in enumerate(positions):
+                bloc[c, :len(p)] = p
+            blocs.append(bloc)
+            conclusions += [conclusion] * longueur
+        return code, np.concatenate(blocs, axis=1), np.array(conclusions, dtype=np.intp)
+
+    def _regions_disjointes(self):
+        """
+        Découpe les règles de chaque conclusion en régions disjointes qui couvrent exactement les memes combinaisons
+        de classes floues : une règle moins les régions déjà gardées de sa conclusion donne au plus un morceau par entrée.
+
+        Returns:
+            tuple: Par entrée un tableau (régions, labels) des labels acceptés par chaque région,
+            et la conclusion de chaque région.
+        """
+        if self._regions is None:
+            # une région est un masque de labels par entrée, en entiers Python (bit j pour le label j)
+            masques = [self._correspondances(i)[self.antecedents[:, i]] for i in range(len(self.noms))]
+            poids = [1 << np.arange(masque.shape[1], dtype=object) for masque in masques]
+            regles = list(zip(*[(masque * bits).sum(axis=1).tolist() for masque, bits in zip(masques, poids)]))
+
+            regions, conclusions = [], []
+            for conclusion in np.unique(self.conclusions_regles):
+                # les grandes régions d'abord, les petites ne font alors que des trous dedans
+                gardees = []
+                for r in sorted(np.flatnonzero(self.conclusions_regles == conclusion), key=lambda r: -np.prod([bin(x).count("1") for x in regles[r]])):
+                    morceaux = [regles[r]]
+                    for region in gardees:
+                        morceaux = [reste for morceau in morceaux for reste in _difference(morceau, region)]
+                    gardees += morceaux
+                regions += gardees
+                conclusions += [conclusion] * len(gardees)
+
+            tailles = [len(labels) for labels in self.labels]
+            self._regions = ([np.array([[region[i] >> j & 1 for j in range(taille)] for region in regions], dtype=bool).reshape(-1, taille)
+                              for i, taille in enumerate(tailles)], np.array(conclusions, dtype=np.intp))
+        return self._regions
+
+    def _activer_regions(self, degres:list, t_norme, categorielles:set, s_norme):
+        """
+        Activations avec une s-norme quelconque, meme résultat que la base écrite en entier (une règle par combinaison
+        de classes floues couverte et par conclusion) sans la construire. Les régions disjointes de chaque conclusion
+        sont évaluées sur les seules combinaisons des labels actifs de chaque ligne : une combinaison avec un degré nul
+        vaut 0 pour toute t-norme, l'élément neutre des s-normes. Une région ne parcourt que les labels actifs de ses
+        entrées à plusieurs labels (jokers, groupes), au plus 2 par entrée pour des trapèzes qui se chevauchent deux à deux.
+        """
+        masques, conclusions_regions = self._regions_disjointes()
+
+        # labels actifs de chaque ligne (K par ligne, complétés par des labels de degré 0) et leurs degrés
+        # pour une entrée catégorielle, le code seul avec un degré 1
+        labels_actifs, valeurs_actives, actifs = [], [], []
+        for i, degre in enumerate(degres):
+            if i in categorielles:
+                labels_actifs.append(degre[..., None])
+                valeurs_actives.append(np.ones(degre.shape + (1,)))
+                actifs.append(np.isin(np.arange(len(self.labels[i])), degre))
+                continue
+            # NaN compris, pour qu'il se propage
+            actives = ~(degre <= 0)
+            k = max(int(actives.sum(axis=-1).max(initial=0)), 1)
+            labels = np.argsort(~actives, axis=-1, kind="stable")[..., :k]
+            labels_actifs.append(labels)
+            valeurs_actives.append(np.where(np.take_along_axis(actives, labels, axis=-1), np.take_along_axis(degre, labels, axis=-1), 0.0))
+            actifs.append(actives.reshape(-1, actives.shape[-1]).any(axis=0))
+
+        forme = np.broadcast_shapes(*[degre.shape if i in categorielles else degre.shape[:-1] for i, degre in enumerate(degres)])
+        activations = np.zeros(forme + (len(self.conclusions),))
+
+        # une région se déclenche si chacune de ses entrées a un label actif dans le lot
+        declenchees = np.ones(len(conclusions_regions), dtype=bool)
+        for masque, actifs_entree in zip(masques, actifs):
+            declenchees &= (masque & actifs_entree).any(axis=1)
+
+        # régions regroupées par entrées continues à plusieurs labels, dont on parcourt les labels actifs
+        multiples = np.column_stack([masque.sum(axis=1) > 1 if i not in categorielles else np.zeros(len(masque), dtype=bool)
+                                     for i, masque in enumerate(masques)])
+        for motif in np.unique(multiples[declenchees], axis=0):
+            # régions rangées par conclusion, comme dans _regions_disjointes
+            regions = np.flatnonzero(declenchees & (multiples == motif).all(axis=1))
+            parcourues = np.flatnonzero(motif)
+            acceptes = {i: masques[i][regions] for i in parcourues}
+            conclusions = conclusions_regions[regions]
+            debuts = np.flatnonzero(np.r_[True, conclusions[1:] != conclusions[:-1]])
+
+            # t-norme des conditions à un seul label ou sur un code, la meme pour toutes les combinaisons de labels actifs
+            fixe = None
+            for i, degre in enumerate(degres):
+                if i in parcourues:
+                    continue
+                if i in categorielles:
+                    condition = masques[i][regions].T[degre].astype(float)
+                else:
+                    condition = degre[..., masques[i][regions].argmax(axis=1)]
+                fixe = condition if fixe is None else t_norme(fixe, condition)
+
+            for emplacements in itertools.product(*[range(labels_actifs[i].shape[-1]) for i in parcourues]):
+                activation_regles = fixe
+                for i, e in zip(parcourues, emplacements):
+                    # degré du label actif choisi s'il est dans la région, 0 sinon (un joker les accepte tous)
+                    condition = valeurs_actives[i][..., e, None]
+                    if not acceptes[i].all():
+                        condition = np.where(acceptes[i].T[labels_actifs[i][..., e]], condition, 0.0)
+                    activation_regles = condition if activation_regles is None else t_norme(activation_regles, condition)
+
+                # s-norme des régions de chaque conclusion, puis avec ce qui est déjà réuni pour ces conclusions
+                partielles = s_norme(np.broadcast_to(activation_regles, forme + (len(regions),)), debuts)
+                cibles = conclusions[debuts]
+                paires = np.stack([activations[..., cibles], partielles], axis=-1).reshape(forme + (2 * len(cibles),))
+                activations[..., cibles] = s_norme(paires, np.arange(0, 2 * len(cibles), 2))
+        return activations
+
+
+# morceaux disjoints de la région a privée de la région b (masques de labels par entrée) :
+# entrées avant d dans a et b, entrée d dans a seulement, entrées après d dans a
+def _difference(a:tuple, b:tuple):
+    if not all(x & y for x, y in zip(a, b)):
+        return [a]
+    morceaux = []
+    commun = list(a)
+    for d, (x, y) in enumerate(zip(a, b)):
+        if x & ~y:
+            morceaux.append(tuple(commun[:d]) + (x & ~y,) + a[d + 1:])
+        commun[d] = x & y
+    return morceaux
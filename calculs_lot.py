@@ -0,0 +1,227 @@
+import math
+
+import numpy as np
+
+
+# Calculs vectorisés de la chaine qui ne dépendent que de NumPy (pas de skfuzzy),
+# partagés par le moteur vectorisé et les modèles qui doivent s'en passer. Les versions _profil font le meme calcul
+# en Python pur pour un seul profil (aperçus du substitut), avec les memes constantes et au meme résultat
+
+
+# parties du corps par défaut, dans l'ordre des colonnes des tableaux par partie
+# (n'importe quel ensemble de groupes musculaires peut etre utilisé, voir MoteurVectorise)
+PARTIES = ("Bras", "Jambes", "Dos", "Torse")
+
+# niveaux des séances de generer_programme encodés par entier, 0 étant le repos
+NIVEAUX = ("Repos", "légère", "modérée", "intense", "très intense")
+
+# seuils d'intensité au dela desquels on passe au niveau de séance suivant
+SEUILS_NIVEAUX = (5, 10, 15, 20)
+
+# entrée de entrees_regles() dont l'univers borne chaque clé floue des profils (tirages, évolutions...)
+UNIVERS = {
+    "Masse grasse": "Masse grasse",
+    "IMC": "IMC",
+    "Objectif Masse Grasse": "Objectif Masse Grasse",
+    "Objectifs": "Objectif Musculaire",
+    "Santés": "Santé"
+}
+
+# coefficients de la formule de harris benedict selon le niveau d'activité
+COEFFICIENTS_ACTIVITE = {1: 1.2, 2: 1.375, 3: 1.55, 4: 1.725}
+
+# coefficients du métabolisme de base de harris benedict selon le sexe : constante, poids, taille, age
+HARRIS_BENEDICT = {"M": (66.5, 13.75, 5.003, 6.75), "F": (655.1, 9.563, 1.850, 4.676)}
+
+# part des calories et kcal par gramme de chaque macronutriment de calculer_macronutriments
+MACRONUTRIMENTS = {"Glucides (g)": (0.45, 4), "Protéines (g)": (0.25, 4), "Lipides (g)": (0.30, 9)}
+
+
+
+# métabolisme de base, les memes opérations dans le meme ordre que calcul_maintenance pour des nombres ou des tableaux
+def _metabolisme_base(coefficients:tuple, taille, poid, age):
+    constante, par_poid, par_taille, par_age = coefficients
+    return constante + (par_poid*poid) + (par_taille*taille) - (par_age*age)
+
+
+def maintenance_lot(taille, poid, age, sexe, activite):
+    """
+    Version vectorisée de calcul_maintenance (formule de harris benedict).
+
+    Args:
+        taille, poid, age (array): Caractéristiques des clients.
+        sexe (array): "M" ou "F" pour chaque client.
+        activite (array): Niveau d'activité de 1 à 4, les autres valeurs ne multiplient pas le métabolisme.
+
+    Returns:
+        array: Les calories de maintenance.
+    """
+    sexe = np.asarray(sexe)
+    if not np.isin(sexe, tuple(HARRIS_BENEDICT)).all():
+        raise ValueError("Le sexe doit valoir 'M' ou 'F'.")
+
+    taille, poid, age = (np.asarray(x, dtype=float) for x in (taille, poid, age))
+    bmr = np.where(sexe == "M", _metabolisme_base(HARRIS_BENEDICT["M"], taille, poid, age),
+                   _metabolisme_base(HARRIS_BENEDICT["F"], taille, poid, age))
+
+    activite = np.asarray(activite)
+    coefficient = np.select([activite == niveau for niveau in COEFFICIENTS_ACTIVITE],
+                            list(COEFFICIENTS_ACTIVITE.values()), default=1.0)
+    return bmr * coefficient
+
+
+# calcul_maintenance pour un profil, au meme résultat que maintenance_lot
+def maintenance_profil(taille:float, poid:float, age:float, sexe:str, activite:int):
+    if sexe not in HARRIS_BENEDICT:
+        raise ValueError("Le sexe doit valoir 'M' ou 'F'.")
+    return _metabolisme_base(HARRIS_BENEDICT[sexe], taille, poid, age) * COEFFICIENTS_ACTIVITE.get(activite, 1.0)
+
+
+def coder_lot(nom:str, valeurs, nombre:int):
+    """
+    Vérifie les codes d'une entrée catégorielle (Entree_categorielle.coder).
+
+    Args:
+        nom (str): Nom de l'entrée, pour les messages d'erreur.
+        valeurs (array): Codes à vérifier.
+        nombre (int): Nombre de classes de l'entrée.
+
+    Returns:
+        array: Les codes en entiers, une erreur est levée si un code n'est pas un entier entre 0 et nombre - 1.
+    """
+    valeurs = np.asarray(valeurs)
+    if valeurs.dtype == bool or not np.issubdtype(valeurs.dtype, np.number):
+        raise ValueError(f"Les codes de {nom} doivent etre des entiers entre 0 et {nombre - 1}.")
+    invalides = (valeurs != np.round(valeurs)) | (valeurs < 0) | (valeurs > nombre - 1)
+    if invalides.any():
+        raise ValueError(f"Code invalide pour {nom} : {valeurs[invalides].ravel()[0]} (entiers entre 0 et {nombre - 1} attendus).")
+    return valeurs.astype(np.intp)
+
+
+def objectif_maximum_lot(objectifs, partition:list, ordre_priorite:list, alpha=0.3):
+    """
+    Version vectorisée de trouver_maximum_prioritaire_alpha, directement sous forme d'entrée floue.
+
+    Args:
+        objectifs (array): Objectifs fuzzifiés (..., parties, classes floues) dans l'ordre de la partition.
+        partition (list): Labels des classes floues de l'objectif.
+        ordre_priorite (list): Liste des catégories dans l'ordre de priorité.
+        alpha (float): Seuil minimum pour qu'une catégorie soit considérée.
+
+    Returns:
+        array: (..., classes floues), 1 pour la catégorie retenue et 0 ailleurs (que des 0 si aucune n'est activée).
+    """
+    rangs = np.array([partition.index(categorie) for categorie in ordre_priorite])
+
+    # catégories au-dessus de l'alpha-coupe sur au moins une partie, sinon simplement activées
+    valides = (objectifs >= alpha).any(axis=-2)[..., rangs]
+    activees = (objectifs > 0).any(axis=-2)[..., rangs]
+    candidates = np.where(valides.any(axis=-1, keepdims=True), valides, activees)
+
+    # argmax donne la premiere catégorie candidate dans l'ordre de priorité
+    choix = rangs[candidates.argmax(axis=-1)]
+    return np.eye(len(partition))[choix] * candidates.any(axis=-1, keepdims=True)
+
+
+# objectifs : degrés normalisés de chaque partie (listes dans l'ordre de la partition)
+# retourne l'indice dans la partition de la catégorie retenue, None si aucune n'est activée
+def objectif_maximum_profil(objectifs:list, partition:list, ordre_priorite:list, alpha=0.3):
+    rangs = [partition.index(categorie) for categorie in ordre_priorite]
+    candidates = [r for r in rangs if any(degres[r] >= alpha for degres in objectifs)] or \
+                 [r for r in rangs if any(degres[r] > 0 for degres in objectifs)]
+    return candidates[0] if candidates else None
+
+
+def macronutriments_lot(calories):
+    """
+    Version vectorisée de calculer_macronutriments, les calories non définies (NaN) donnent 0 g.
+
+    Args:
+        calories (array): Le nombre total de calories.
+
+    Returns:
+        dict: Les grammes de glucides, protéines et lipides (tableaux d'entiers).
+    """
+    calories = np.asarray(calories, dtype=float)
+    definies = np.isfinite(calories)
+
+    def grammes(calories_macro, kcal_par_gramme):
+        return np.where(definies, np.trunc(np.where(definies, calories_macro, 0) / kcal_par_gramme), 0).astype(np.int32)
+
+    return {nom: grammes(calories * part, kcal_par_gramme) for nom, (part, kcal_par_gramme) in MACRONUTRIMENTS.items()}
+
+
+# calculer_macronutriments pour un profil, 0 g pour des calories non définies comme macronutriments_lot
+def macronutriments_profil(calories:float):
+    definies = math.isfinite(calories)
+    return {nom: math.trunc(calories * part / kcal_par_gramme) if definies else 0
+            for nom, (part, kcal_par_gramme) in MACRONUTRIMENTS.items()}
+
+
+def programme_lot(intensites_reelles, jours_max:int=6, seances_max:int=2):
+    """
+    Version vectorisée de generer_programme, les séances sont encodées au lieu d'etre des chaines.
+
+    Args:
+        intensites_reelles (array): Intensités (..., parties), NaN pour une partie non évaluée.
+        jours_max (int): Nombre de jours du programme.
+        seances_max (int): Nombre maximum de séances par partie.
+
+    Returns:
+        tuple: (parties, niveaux) de forme (..., jours), l'indice de la partie entraînée chaque jour
+        (-1 pour le repos) et l'indice du niveau de la séance dans NIVEAUX.
+    """
+    # tri stable par intensité décroissante comme sorted(..., reverse=True), les NaN en dernier
+    cle = np.where(np.isnan(intensites_reelles), -np.inf, intensites_reelles)
+    ordre = np.argsort(-cle, axis=-1, kind="stable")
+    tries = np.take_along_axis(intensites_reelles, ordre, axis=-1)
+
+    # les parties assez intenses pour etre entraînées passent devant en gardant leur ordre
+    entrainees = tries > SEUILS_NIVEAUX[0]
+    devant = np.argsort(~entrainees, axis=-1, kind="stable")
+    ordre = np.take_along_axis(ordre, devant, axis=-1)
+    tries = np.take_along_axis(tries, devant, axis=-1)
+    niveaux_tries = (tries[..., None] > np.array(SEUILS_NIVEAUX)).sum(axis=-1)
+
+    # generer_programme fait seances_max tours des parties entraînées puis complète avec du repos
+    nombre = entrainees.sum(axis=-1, keepdims=True)
+    jours = np.arange(jours_max)
+    rang = jours % np.maximum(nombre, 1)
+    seance = jours < seances_max * nombre
+
+    # int16 : les indices de parties dépassent 127 avec de grands ensembles de groupes musculaires
+    parties = np.where(seance, np.take_along_axis(ordre, rang, axis=-1), -1).astype(np.int16)
+    niveaux = np.where(seance, np.take_along_axis(niveaux_tries, rang, axis=-1), 0).astype(np.int8)
+    return parties, niveaux
+
+
+def programme_profil(intensites_reelles:list, jours_max:int=6, seances_max:int=2):
+    """
+    Meme programme que programme_lot pour les intensités d'un seul profil.
+
+    Args:
+        intensites_reelles (list): Intensités de chaque partie, NaN pour une partie non évaluée.
+        jours_max (int): Nombre de jours du programme.
+        seances_max (int): Nombre maximum de séances par partie.
+
+    Returns:
+        tuple: (parties, niveaux) listes de longueur jours_max, comme une ligne de programme_lot.
+    """
+    # tri stable par intensité décroissante, les NaN en dernier, puis les parties entraînées devant
+    def cle(k):
+        return math.inf if math.isnan(intensites_reelles[k]) else -intensites_reelles[k]
+
+    ordre = sorted(range(len(intensites_reelles)), key=cle)
+    ordre = sorted(ordre, key=lambda k: not intensites_reelles[k] > SEUILS_NIVEAUX[0])
+    nombre = sum(x > SEUILS_NIVEAUX[0] for x in intensites_reelles)
+
+    parties, niveaux = [], []
+    for jour in range(jours_max):
+        if jour < seances_max * nombre:
+            partie = ordre[jour % nombre]
+            parties.append(partie)
+            niveaux.append(sum(intensites_reelles[partie] > seuil for seuil in SEUILS_NIVEAUX))
+        else:
+            parties.append(-1)
+            niveaux.append(0)
+    return parties, niveaux
@@ -0,0 +1,169 @@
+import json
+
+import numpy as np
+
+# pyarrow n'est nécessaire que pour l'export, on ne l'impose pas au reste du projet
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from calculs_lot import NIVEAUX, PARTIES
+
+
+# Export colonnes (Arrow / Parquet) des résultats de MoteurVectorise.evaluer
+# Les tableaux NumPy du moteur sont repris tels quels comme buffers Arrow, sans passer par des dict ou des chaines par client
+
+
+# colonnes scalaires exportées et leur type Arrow
+COLONNES = {
+    "Apports caloriques": "float64",
+    "Glucides (g)": "int32",
+    "Protéines (g)": "int32",
+    "Lipides (g)": "int32",
+}
+
+# colonnes par partie / par jour, exportées en listes de taille fixe
+COLONNES_LISTES = {
+    "Intensités réelles": "float64",
+    "Programme parties": "int16",
+    "Programme niveaux": "int8",
+}
+
+
+def _verifier_pyarrow():
+    if pa is None:
+        raise ImportError("L'export Arrow/Parquet nécessite pyarrow (pip install pyarrow).")
+
+
+# bitmap de validité Arrow et nombre de nuls, rien à allouer quand toutes les lignes sont valides
+def _validite(valide):
+    if valide is None or valide.all():
+        return None, 0
+    return pa.py_buffer(np.packbits(valide, bitorder="little")), int(len(valide) - valide.sum())
+
+
+# enveloppe un tableau NumPy contigu dans un tableau Arrow sans copier les données
+# valide (optionnel) donne les lignes non nulles, seul le bitmap de validité est alloué
+def _sans_copie(tableau, type_arrow, valide=None):
+    tableau = np.ascontiguousarray(tableau)
+    validite, nombre_nuls = _validite(valide)
+    return pa.Array.from_buffers(type_arrow, len(tableau), [validite, pa.py_buffer(tableau)], null_count=nombre_nuls)
+
+
+# liste de taille fixe par ligne autour des valeurs aplaties, les lignes non valides sont nulles
+def _listes_sans_copie(tableau, type_liste, valide):
+    valeurs = _sans_copie(np.reshape(tableau, -1), type_liste.value_type)
+    validite, nombre_nuls = _validite(valide)
+    return pa.Array.from_buffers(type_liste, len(valide), [validite], null_count=nombre_nuls, children=[valeurs])
+
+
+def schema_resultats(parties=PARTIES, jours:int=6):
+    """
+    Schéma Arrow des lots exportés, les noms des parties et des niveaux sont dans les métadonnées
+    pour décoder les colonnes "Programme parties" et "Programme niveaux".
+
+    Args:
+        parties (tuple): Parties du corps, dans l'ordre des colonnes par partie.
+        jours (int): Nombre de jours du programme.
+
+    Returns:
+        pyarrow.Schema: Le schéma des record batches.
+    """
+    _verifier_pyarrow()
+    champs = [pa.field(nom, pa.type_for_alias(type_arrow)) for nom, type_arrow in COLONNES.items()]
+    champs.append(pa.field("Intensités réelles", pa.list_(pa.float64(), len(parties))))
+    for nom in ("Programme parties", "Programme niveaux"):
+        champs.append(pa.field(nom, pa.list_(pa.type_for_alias(COLONNES_LISTES[nom]), jours)))
+    champs.append(pa.field("Danger", pa.bool_()))
+    metadonnees = {
+        "parties": json.dumps(list(parties), ensure_ascii=False),
+        "niveaux": json.dumps(list(NIVEAUX), ensure_ascii=False),
+    }
+    return pa.schema(champs, metadata=metadonnees)
+
+
+# parties des résultats : celles données doivent correspondre à leur largeur, sans parties on prend PARTIES
+# si la largeur est la meme et sinon des noms numérotés
+def _parties_resultats(resultats:dict, parties):
+    largeur = np.shape(resultats["Intensités réelles"])[-1]
+    if parties is None:
+        return PARTIES if largeur == len(PARTIES) else tuple(f"Partie {i + 1}" for i in range(largeur))
+    if len(parties) != largeur:
+        raise ValueError(f"Les résultats ont {largeur} parties mais {len(parties)} parties sont données {list(parties)}, "
+                         "passez les parties du moteur (moteur.parties).")
+    return parties
+
+
+def vers_record_batch(resultats:dict, parties=None):
+    """
+    Convertit les résultats d'un lot en record batch Arrow sans copier les tableaux numériques.
+
+    Args:
+        resultats (dict): Sortie de MoteurVectorise.evaluer, les dimensions de tête sont aplaties.
+        parties (tuple): Parties du corps dans l'ordre des colonnes par partie (moteur.parties), déduites de
+            la largeur des résultats si elles ne sont pas données.
+
+    Returns:
+        pyarrow.RecordBatch: Une ligne par client, les lignes non valides sont nulles dans toutes les colonnes
+        sauf "Danger", qui dit si le client est non valide à cause d'un DANGER.
+    """
+    _verifier_pyarrow()
+    parties = _parties_resultats(resultats, parties)
+    valide = np.asarray(resultats["Valide"]).reshape(-1)
+    jours = resultats["Programme parties"].shape[-1]
+    schema = schema_resultats(parties, jours)
+
+    colonnes = [_sans_copie(np.reshape(resultats[nom], -1), schema.field(nom).type, valide) for nom in COLONNES]
+    for nom in COLONNES_LISTES:
+        colonnes.append(_listes_sans_copie(resultats[nom], schema.field(nom).type, valide))
+    # les booléens Arrow sont des bits, cette colonne est la seule à etre recopiée
+    colonnes.append(pa.array(np.reshape(resultats["Danger"], -1)))
+
+    return pa.RecordBatch.from_arrays(colonnes, schema=schema)
+
+
+def ecrire_parquet(lots, chemin:str, parties=None):
+    """
+    Ecrit des lots de résultats dans un fichier Parquet, un row group par lot.
+
+    Args:
+        lots (iterable): Résultats successifs de MoteurVectorise.evaluer.
+        chemin (str): Chemin du fichier Parquet.
+        parties (tuple): Parties du corps dans l'ordre des colonnes par partie (moteur.parties), voir vers_record_batch.
+    """
+    _verifier_pyarrow()
+    ecrivain = None
+    try:
+        for resultats in lots:
+            batch = vers_record_batch(resultats, parties)
+            if ecrivain is None:
+                ecrivain = pq.ParquetWriter(chemin, batch.schema)
+            ecrivain.write_batch(batch)
+    finally:
+        if ecrivain is not None:
+            ecrivain.close()
+
+
+def ecrire_arrow(lots, chemin:str, parties=None):
+    """
+    Ecrit des lots de résultats dans un fichier Arrow IPC, un record batch par lot.
+
+    Args:
+        lots (iterable): Résultats successifs de MoteurVectorise.evaluer.
+        chemin (str): Chemin du fichier Arrow.
+        parties (tuple): Parties du corps dans l'ordre des colonnes par partie (moteur.parties), voir vers_record_batch.
+    """
+    _verifier_pyarrow()
+    ecrivain = None
+    try:
+        for resultats in lots:
+            batch = vers_record_batch(resultats, parties)
+            if ecrivain is None:
+                ecrivain = pa.ipc.new_file(chemin, batch.schema)
+            ecrivain.write_batch(batch)
+    finally:
+        if ecrivain is not None:
+            ecrivain.close()
@@ -0,0 +1,121 @@
+import numpy as np
+
+from calculs_lot import NIVEAUX, SEUILS_NIVEAUX, UNIVERS
+from moteur_vectorise import MoteurVectorise
+
+
+# Propagation de l'incertitude des mesures par Monte Carlo : les entrées nettes d'un profil sont bruitées
+# et tous les tirages passent dans le moteur vectorisé en une évaluation, au lieu de relancer main() à chaque fois
+
+
+# écart type par défaut de l'erreur de mesure sur chaque entrée bruitée
+BRUITS = {
+    "Masse grasse": 0.02,
+    "Poids": 1.0,
+    "Taille": 1.0,
+    "IMC": 1.0,
+    "Objectif Masse Grasse": 0.01,
+    "Objectifs": 0.05,
+    "Santés": 0.05
+}
+
+# bornes des mesures qui n'ont pas d'univers, pour qu'un grand bruit ne donne pas un poids ou une taille absurde
+BORNES = {
+    "Poids": (20.0, 350.0),
+    "Taille": (100.0, 250.0)
+}
+
+
+def niveaux_par_partie(intensites_reelles):
+    """
+    Catégorie de séance de generer_programme atteinte par chaque partie.
+
+    Args:
+        intensites_reelles (array): Intensités (..., parties).
+
+    Returns:
+        array: Indice dans NIVEAUX (0 pour une partie qui n'est pas entraînée).
+    """
+    return (intensites_reelles[..., None] > np.array(SEUILS_NIVEAUX)).sum(axis=-1)
+
+
+def propager_incertitude(profils:dict, bruits:dict=None, n_echantillons:int=10000, percentiles=(5, 50, 95),
+                         moteur:MoteurVectorise=None, taille_bloc:int=1000, graine=None):
+    """
+    Evalue les bandes de confiance des recommandations pour des profils aux mesures bruitées.
+
+    Args:
+        profils (dict): Profils des clients au format de MoteurVectorise.evaluer, de forme (clients,).
+        bruits (dict): Ecart type du bruit gaussien par clé des profils (voir BRUITS), un scalaire
+            ou un tableau qui se diffuse avec l'entrée. Sans "IMC" dans les profils, l'IMC de chaque tirage est
+            calculé à partir du poids et de la taille bruités et le bruit de l'IMC est ignoré.
+        n_echantillons (int): Nombre de tirages par client.
+        percentiles (tuple): Percentiles à calculer.
+        moteur (MoteurVectorise): Moteur à utiliser, celui de entrees_regles() par défaut.
+        taille_bloc (int): Nombre de tirages évalués ensemble, pour borner la mémoire.
+        graine (int): Graine du générateur aléatoire.
+
+    Returns:
+        dict: Percentiles des apports caloriques (clients, percentiles) et des intensités réelles
+        (clients, parties, percentiles) sur les tirages valides, probabilité de chaque niveau de séance
+        (clients, parties, niveaux), probabilité de DANGER et de tirage non valide (clients,).
+    """
+    moteur = MoteurVectorise() if moteur is None else moteur
+    bruits = BRUITS if bruits is None else bruits
+    rng = np.random.default_rng(graine)
+
+    profils = {cle: np.asarray(valeur) for cle, valeur in profils.items()}
+    # l'IMC n'est bruité directement que s'il est donné, sinon le moteur le recalcule pour chaque tirage
+    if "IMC" not in profils:
+        bruits = {cle: ecart_type for cle, ecart_type in bruits.items() if cle != "IMC"}
+
+    apports, intensites, danger, valide = [], [], [], []
+    for debut in range(0, n_echantillons, taille_bloc):
+        n = min(taille_bloc, n_echantillons - debut)
+
+        # axe des tirages devant celui des clients
+        tirages = {cle: valeur[None] for cle, valeur in profils.items()}
+        for cle, ecart_type in bruits.items():
+            valeur = profils[cle]
+            bruitee = valeur + np.asarray(ecart_type) * rng.standard_normal((n,) + valeur.shape)
+            if cle in UNIVERS:
+                univers = moteur.d[UNIVERS[cle]].univers
+                bruitee = np.clip(bruitee, univers[0], univers[-1])
+            elif cle in BORNES:
+                bruitee = np.clip(bruitee, *BORNES[cle])
+            tirages[cle] = bruitee
+
+        resultats = moteur.evaluer(tirages)
+        apports.append(resultats["Apports caloriques"])
+        intensites.append(resultats["Intensités réelles"])
+        danger.append(resultats["Danger"])
+        valide.append(resultats["Valide"])
+
+    apports = np.concatenate(apports)
+    intensites = np.concatenate(intensites)
+    danger = np.concatenate(danger)
+    valide = np.concatenate(valide)
+
+    # les tirages non valides sont à NaN dans le moteur et ignorés par les percentiles
+    with np.errstate(invalid="ignore"):
+        niveaux = niveaux_par_partie(intensites)
+        nombre_valides = valide.sum(axis=0)[..., None, None]
+        probabilites = np.stack([((niveaux == i) & valide[..., None]).sum(axis=0) for i in range(len(NIVEAUX))], axis=-1) / nombre_valides
+
+    return {
+        "Percentiles": list(percentiles),
+        "Apports caloriques": np.moveaxis(_percentiles(apports, percentiles), 0, -1),
+        "Intensités réelles": np.moveaxis(_percentiles(intensites, percentiles), 0, -1),
+        "Probabilités niveaux": probabilites,
+        "Probabilité danger": danger.mean(axis=0),
+        "Probabilité non valide": 1 - valide.mean(axis=0)
+    }
+
+
+# percentiles sur l'axe des tirages, NaN pour un client sans aucun tirage valide
+def _percentiles(tirages, percentiles):
+    resultat = np.full((len(percentiles),) + tirages.shape[1:], np.nan)
+    definis = np.isfinite(tirages).any(axis=0)
+    if definis.any():
+        resultat[:, definis] = np.nanpercentile(tirages[:, definis], percentiles, axis=0)
+    return resultat
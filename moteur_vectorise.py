@@ -0,0 +1,317 @@
+import numpy as np
+
+from Renforcement_musculaire_SY10 import Entree_categorielle, Entree_floue, SystemeFlou, entrees_regles
+from base_regles import BaseRegles
+from normes import S_NORMES, choisir_norme
+from calculs_lot import PARTIES, macronutriments_lot, maintenance_lot, objectif_maximum_lot, programme_lot
+
+
+# Moteur vectorisé : la meme chaine de SIF que main() mais évaluée sur des tableaux NumPy
+# pour traiter un lot de clients d'un coup (les dimensions de tête des tableaux sont libres)
+
+
+# Equivalent vectorisé de SystemeFlou : les degrés d'entrée sont des tableaux (..., nombre de classes floues),
+# ou des tableaux (...) de codes pour les entrées catégorielles
+# et les règles sont compilées une fois pour toutes dans une BaseRegles
+class SystemeFlouVectorise:
+
+    def __init__(self, entrees:list, regles, t_norme:str="min", defaut:str=None, s_norme:str="max"):
+        self.noms = [entree.nom for entree in entrees]
+        self.labels = [list(entree.partition.keys()) for entree in entrees]
+        self.regles = regles if isinstance(regles, BaseRegles) else BaseRegles(self.noms, self.labels, regles, defaut)
+        # memes noyaux que SystemeFlou
+        self.t_norme = choisir_norme(SystemeFlou.functable, t_norme)
+        self.s_norme = choisir_norme(S_NORMES, s_norme)
+        self.categorielles = [entree.nom for entree in entrees if isinstance(entree, Entree_categorielle)]
+
+        # conclusions dans l'ordre d'apparition, comme les clés du dictionnaire rendu par SystemeFlou.activation_regles
+        self.conclusions = self.regles.conclusions
+
+    # degres : un tableau (..., nombre de classes floues) par entrée, dans l'ordre des entrées du systeme
+    # retourne le tableau (..., nombre de conclusions) des activations, s-norme des règles comme SystemeFlou
+    def activation_regles(self, *degres):
+        par_nom = dict(zip(self.noms, degres))
+        return self.regles.activer([par_nom[nom] for nom in self.regles.noms], self.t_norme, self.categorielles, self.s_norme)
+
+
+
+##########################################################################################################################################
+
+
+
+# fuzzifie un tableau de valeurs nettes sur la partition d'une Entree_nette, comme fuzz.interp_membership
+# l'intervalle de l'univers qui contient chaque valeur est cherché une seule fois pour toutes les classes floues,
+# puis chaque degré est interpolé avec la meme formule que np.interp
+def fuzzifier_lot(entree, valeurs):
+    valeurs = np.asarray(valeurs, dtype=float)
+    univers = entree.univers
+    fonctions = np.stack(list(entree.partition.values()), axis=-1)
+    j = np.clip(np.searchsorted(univers, valeurs, side="right") - 1, 0, len(univers) - 2)
+    f0, f1 = fonctions[j], fonctions[j + 1]
+    pentes = (f1 - f0) / (univers[j + 1] - univers[j])[..., None]
+    degres = pentes * (valeurs - univers[j])[..., None] + f0
+    degres = np.where((valeurs == univers[-1])[..., None], fonctions[-1], degres)
+    dans_univers = (valeurs >= univers[0]) & (valeurs <= univers[-1])
+    return np.where(dans_univers[..., None], degres, 0.0)
+
+# fonction d'appartenance trapézoïdale fuzz.trapmf évaluée en x, coordonnees (..., 4) en notation de Kaufmann
+def trapeze_lot(x, coordonnees):
+    a, b, c, d = (coordonnees[..., i] for i in range(4))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gauche = np.where((a < x) & (x < b), (x - a) / (b - a), 0.0)
+        droite = np.where((c < x) & (x < d), (d - x) / (d - c), 0.0)
+    y = np.where(x <= b, np.where(x == b, 1.0, gauche), 1.0)
+    y = np.where(x >= c, np.where(x == c, 1.0, droite), y)
+    return np.where((x < a) | (x > d), 0.0, y)
+
+# meme résultat que fuzzifier_lot sur une Entree_nette dont la partition serait donnée par coordonnees (..., classes floues, 4),
+# sans échantillonner les trapèzes sur tout l'univers : seuls les deux points de l'univers qui encadrent chaque valeur sont calculés
+def fuzzifier_trapezes_lot(univers, coordonnees, valeurs):
+    valeurs = np.asarray(valeurs, dtype=float)
+    j = np.clip(np.searchsorted(univers, valeurs, side="right") - 1, 0, len(univers) - 2)
+    x0, x1 = univers[j], univers[j + 1]
+    t = ((valeurs - x0) / (x1 - x0))[..., None]
+    degres = (1 - t) * trapeze_lot(x0[..., None], coordonnees) + t * trapeze_lot(x1[..., None], coordonnees)
+    dans_univers = (valeurs >= univers[0]) & (valeurs <= univers[-1])
+    return np.where(dans_univers[..., None], degres, 0.0)
+
+# normalise par la hauteur max, les lignes toutes nulles (où Entree_floue.normaliser lève une erreur) valent NaN
+def normaliser_lot(degres):
+    hauteur_max = degres.max(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(hauteur_max > 0, degres / hauteur_max, np.nan)
+
+# defuzzification barycentrique ZZ-gamma, NaN là où Entree_floue.defuzzification lève une erreur
+def defuzzifier_lot(degres, valeurs_regression, gamma:int=1):
+    poids = degres ** gamma
+    denominateur = poids.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominateur > 0, (poids * np.asarray(valeurs_regression, dtype=float)).sum(axis=-1) / denominateur, np.nan)
+
+
+##########################################################################################################################################
+
+
+
+# Chaine complète de main() sur un lot de profils
+class MoteurVectorise:
+
+    # valeurs de régression des défuzzifications de main(), dans l'ordre des conclusions des SIF
+    valeurs_nutrition = [-500, -400, -200, 0, 200, 400]
+    valeurs_intensite_possible = [20, 25, 30, 15, 5, 10]
+    valeurs_intensite_necessaire = [5, 10, 15, 20, 25, 30]
+
+    # nom des valeurs de régression dans un dictionnaire de paramètres -> attribut du moteur
+    regressions = {"valeurs nutrition": "valeurs_nutrition",
+                   "valeurs intensité possible": "valeurs_intensite_possible",
+                   "valeurs intensité nécessaire": "valeurs_intensite_necessaire"}
+
+    ordre_priorite = ["gros gain", "gain modéré", "inchangé", "perte"]
+    alpha = 0.3
+
+    # programme de generer_programme : nombre de jours et nombre maximum de séances par partie
+    jours = 6
+    seances_max = 2
+
+    # d est le dictionnaire des entrées et règles, celui de entrees_regles() par défaut
+    # valeurs_regression remplace tout ou partie des valeurs de régression, avec les clés de regressions
+    # parties : groupes musculaires dans l'ordre des colonnes des tableaux par partie, PARTIES par défaut
+    def __init__(self, d:dict=None, valeurs_regression:dict=None, parties:list=None, jours:int=None, seances_max:int=None):
+        self.d = entrees_regles() if d is None else d
+        d = self.d
+
+        self.parties = tuple(PARTIES if parties is None else parties)
+        # les programmes encodent l'indice de la partie en int16
+        if len(self.parties) > np.iinfo(np.int16).max:
+            raise ValueError(f"Au plus {np.iinfo(np.int16).max} parties, {len(self.parties)} données.")
+        if jours is not None:
+            self.jours = jours
+        if seances_max is not None:
+            self.seances_max = seances_max
+
+        for nom, valeurs in (valeurs_regression or {}).items():
+            setattr(self, self.regressions[nom], list(valeurs))
+
+        # Les six SIF de main(), compilés une seule fois
+        self.SIF_conditions = self._sif([d["Masse grasse"], d["IMC"]], "regles SIF Conditions Biologiques")
+        conditions = Entree_floue("Conditions", self.SIF_conditions.conclusions)
+
+        objectif_max = Entree_floue("Objectif Musculaire Maximum", list(d["Objectif Musculaire"].partition))
+        self.SIF_nutrition_1 = self._sif([conditions, objectif_max], "regles SIF Nutrition 1")
+        nutrition_provisoire = Entree_floue("Nutrition Provisoire", self.SIF_nutrition_1.conclusions)
+        self.SIF_nutrition_2 = self._sif([nutrition_provisoire, d["Objectif Masse Grasse"]], "regles SIF Nutrition 2")
+
+        self.SIF_intensite_necessaire_1 = self._sif([d["Génétique"], d["Objectif Musculaire"]], "regles SIF Intensité Nécessaire 1")
+        intermediaire = Entree_floue("Intensité nécessaire intermédiaire", self.SIF_intensite_necessaire_1.conclusions)
+        self.SIF_intensite_necessaire_2 = self._sif([d["Impact du dopage"], intermediaire], "regles SIF Intensité Nécessaire 2")
+
+        self.SIF_intensite_possible = self._sif([d["Santé"], d["Apports caloriques"]], "regles SIF Intensité Possible")
+
+    # SIF compilé à partir des règles d[cle], d["defauts"] (optionnel) donne la conclusion par défaut de chaque jeu de règles
+    # et d["normes"] (optionnel) ses normes {"t-norme": nom, "s-norme": nom}, min et max par défaut
+    def _sif(self, entrees:list, cle:str):
+        normes = self.d.get("normes", {}).get(cle, {})
+        return SystemeFlouVectorise(entrees, self.d[cle], normes.get("t-norme", "min"), defaut=self.d.get("defauts", {}).get(cle),
+                                    s_norme=normes.get("s-norme", "max"))
+
+    # Les paramètres optionnels des étapes remplacent les trapèzes d'une entrée (clé de d -> tableau (..., classes floues, 4))
+    # ou des valeurs de régression (clé de regressions -> tableau (..., conclusions)). Leurs dimensions de tête
+    # se diffusent avec celles des profils, ce qui permet d'évaluer plusieurs jeux de paramètres en une passe
+
+    # les entrées catégorielles ne sont pas fuzzifiées : les codes sont vérifiés (erreur si un code est invalide) et passés tels quels
+    def _fuzzifier(self, cle:str, valeurs, parametres:dict=None, par_partie:bool=False):
+        if isinstance(self.d[cle], Entree_categorielle):
+            return self.d[cle].coder(valeurs)
+        if parametres is None or cle not in parametres:
+            return fuzzifier_lot(self.d[cle], valeurs)
+        coordonnees = np.asarray(parametres[cle], dtype=float)
+        if par_partie:
+            coordonnees = coordonnees[..., None, :, :]
+        return fuzzifier_trapezes_lot(self.d[cle].univers, coordonnees, valeurs)
+
+    def _valeurs_regression(self, cle:str, parametres:dict=None, par_partie:bool=False):
+        if parametres is None or cle not in parametres:
+            return getattr(self, self.regressions[cle])
+        valeurs = np.asarray(parametres[cle], dtype=float)
+        return valeurs[..., None, :] if par_partie else valeurs
+
+    # SIF Conditions biologiques, sortie normalisée (..., conclusions)
+    def conditions(self, masse_grasse, imc, parametres:dict=None):
+        degres = self.SIF_conditions.activation_regles(self._fuzzifier("Masse grasse", masse_grasse, parametres),
+                                                       self._fuzzifier("IMC", imc, parametres))
+        return normaliser_lot(degres)
+
+    # objectifs nets (..., parties) -> objectifs fuzzifiés normalisés (..., parties, 4) et objectif maximum (..., 4)
+    def objectifs(self, objectifs_nets, parametres:dict=None):
+        objectifs = normaliser_lot(self._fuzzifier("Objectif Musculaire", objectifs_nets, parametres, par_partie=True))
+        objectif_max = objectif_maximum_lot(objectifs, list(self.d["Objectif Musculaire"].partition), self.ordre_priorite, self.alpha)
+        return objectifs, objectif_max
+
+    # SIF Nutrition 1 et 2, retourne les calories à ajouter/soustraire et les lignes en DANGER
+    def nutrition(self, conditions, objectif_max, objectif_mg, parametres:dict=None):
+        sortie_nutrition_1 = self.SIF_nutrition_1.activation_regles(conditions, objectif_max)
+        sortie_objectif_mg = normaliser_lot(self._fuzzifier("Objectif Masse Grasse", objectif_mg, parametres))
+        sortie_nutrition_2 = normaliser_lot(self.SIF_nutrition_2.activation_regles(sortie_nutrition_1, sortie_objectif_mg))
+
+        danger = np.zeros(sortie_nutrition_2.shape[:-1], dtype=bool)
+        for sif, sortie in ((self.SIF_nutrition_1, sortie_nutrition_1), (self.SIF_nutrition_2, sortie_nutrition_2)):
+            if "DANGER" in sif.conclusions:
+                danger |= sortie[..., sif.conclusions.index("DANGER")] > 0
+
+        return defuzzifier_lot(sortie_nutrition_2, self._valeurs_regression("valeurs nutrition", parametres)), danger
+
+    # SIF Intensité nécessaire 1 + 2 sur toutes les parties à la fois, retourne les barycentres (..., parties)
+    def intensite_necessaire(self, genetiques, objectifs, impact_dopage, parametres:dict=None):
+        genetique = self._fuzzifier("Génétique", genetiques, parametres, par_partie=True)
+        intermediaire = self.SIF_intensite_necessaire_1.activation_regles(genetique, objectifs)
+        # l'impact du dopage est commun à toutes les parties
+        dopage = self._fuzzifier("Impact du dopage", np.expand_dims(impact_dopage, -1), parametres, par_partie=True)
+        sortie = normaliser_lot(self.SIF_intensite_necessaire_2.activation_regles(dopage, intermediaire))
+        return defuzzifier_lot(sortie, self._valeurs_regression("valeurs intensité nécessaire", parametres, par_partie=True))
+
+    # SIF Intensité possible sur toutes les parties à la fois, retourne les barycentres (..., parties)
+    def intensite_possible(self, santes, apports_caloriques, parametres:dict=None):
+        apports = self._fuzzifier("Apports caloriques", apports_caloriques, parametres)[..., None, :]
+        sante = self._fuzzifier("Santé", santes, parametres, par_partie=True)
+        sortie = normaliser_lot(self.SIF_intensite_possible.activation_regles(sante, apports))
+        return defuzzifier_lot(sortie, self._valeurs_regression("valeurs intensité possible", parametres, par_partie=True))
+
+    def evaluer(self, profils:dict, parametres:dict=None):
+        """
+        Evalue toute la chaine de main() sur un lot de profils.
+
+        Args:
+            profils (dict): Tableaux des entrées de main() de forme (...) :
+                "Masse grasse", "Age", "Taille", "Sexe", "Poids", "Activité", "Objectif Masse Grasse",
+                "Dopage", "Répondance", et de forme (..., parties) dans l'ordre de self.parties :
+                "Objectifs", "Génétiques", "Santés". Un tableau "IMC" optionnel remplace l'IMC calculé.
+            parametres (dict): Trapèzes ou valeurs de régression à utiliser à la place de ceux du moteur.
+
+        Returns:
+            dict: Les tableaux de résultats, "Valide" est faux là où main() s'arreterait (DANGER ou erreur).
+        """
+        p = {cle: np.asarray(valeur) for cle, valeur in profils.items()}
+        for cle in ("Objectifs", "Génétiques", "Santés"):
+            if p[cle].shape[-1:] != (len(self.parties),):
+                raise ValueError(f"{cle} doit avoir une colonne par partie {self.parties}, forme reçue {p[cle].shape}.")
+
+        maintenance = maintenance_lot(p["Taille"], p["Poids"], p["Age"], p["Sexe"], p["Activité"])
+        imc = p["IMC"] if "IMC" in p else p["Poids"] / (p["Taille"] / 100) ** 2
+
+        conditions = self.conditions(p["Masse grasse"], imc, parametres)
+        objectifs, objectif_max = self.objectifs(p["Objectifs"], parametres)
+        augmentation, danger = self.nutrition(conditions, objectif_max, p["Objectif Masse Grasse"], parametres)
+        apports_caloriques = maintenance + augmentation
+
+        # sans dopage l'impact est "Aucun impact", ce qui correspond à la valeur 0
+        impact_dopage = np.where(p["Dopage"], p["Répondance"], 0)
+        intensites_nec = self.intensite_necessaire(p["Génétiques"], objectifs, impact_dopage, parametres)
+        intensites_pos = self.intensite_possible(p["Santés"], apports_caloriques, parametres)
+        return self.resultats(maintenance, augmentation, danger, intensites_nec, intensites_pos)
+
+    # assemble les résultats finaux (intensités réelles, programme, macronutriments) à partir des sorties des étapes
+    def resultats(self, maintenance, augmentation, danger, intensites_nec, intensites_pos):
+        apports_caloriques = maintenance + augmentation
+        intensites_reelles = np.minimum(intensites_pos, intensites_nec)
+
+        valide = ~danger & np.isfinite(apports_caloriques) & np.isfinite(intensites_reelles).all(axis=-1)
+        apports_caloriques = np.where(valide, apports_caloriques, np.nan)
+        intensites_reelles = np.where(valide[..., None], intensites_reelles, np.nan)
+        programme_parties, programme_niveaux = programme_lot(intensites_reelles, self.jours, self.seances_max)
+
+        return {
+            "Maintenance": maintenance,
+            "Augmentation": augmentation,
+            "Apports caloriques": apports_caloriques,
+            **macronutriments_lot(apports_caloriques),
+            "Intensités nécessaires": intensites_nec,
+            "Intensités possibles": intensites_pos,
+            "Intensités réelles": intensites_reelles,
+            "Programme parties": programme_parties,
+            "Programme niveaux": programme_niveaux,
+            "Danger": danger,
+            "Valide": valide
+        }
+
+
+
+##########################################################################################################################################
+
+
+
+def echantillonner_profils(n:int, moteur:MoteurVectorise=None, graine=None):
+    """
+    Tire des profils uniformément dans l'espace des profils (univers des entrées de entrees_regles()).
+
+    Args:
+        n (int): Nombre de profils.
+        moteur (MoteurVectorise): Moteur dont on prend les univers, celui de entrees_regles() par défaut.
+        graine (int): Graine du générateur aléatoire.
+
+    Returns:
+        dict: Profils au format de MoteurVectorise.evaluer.
+    """
+    moteur = MoteurVectorise() if moteur is None else moteur
+    rng = np.random.default_rng(graine)
+    d = moteur.d
+
+    def uniforme(cle, forme=()):
+        univers = d[cle].univers
+        return rng.uniform(univers[0], univers[-1], (n,) + forme)
+
+    parties = len(moteur.parties)
+    return {
+        "Masse grasse": uniforme("Masse grasse"),
+        "IMC": uniforme("IMC"),
+        "Age": rng.integers(15, 80, n),
+        "Taille": rng.uniform(140, 210, n),
+        "Sexe": rng.choice(["M", "F"], n),
+        "Poids": rng.uniform(40, 150, n),
+        "Activité": rng.integers(1, 5, n),
+        "Objectif Masse Grasse": uniforme("Objectif Masse Grasse"),
+        "Dopage": rng.integers(0, 2, n).astype(bool),
+        "Répondance": rng.integers(0, len(d["Impact du dopage"].partition), n),
+        "Objectifs": uniforme("Objectif Musculaire", (parties,)),
+        "Génétiques": rng.integers(0, len(d["Génétique"].partition), (n, parties)),
+        "Santés": uniforme("Santé", (parties,))
+    }
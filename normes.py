@@ -0,0 +1,74 @@
+import numpy as np
+
+
+# T-normes (ET entre les conditions d'une règle) et s-normes (OU entre les règles d'une meme conclusion)
+# sous forme de noyaux NumPy sur des tableaux entiers d'activations. Les memes fonctions servent à SystemeFlou
+# (une valeur) et au moteur vectorisé (des lots), via BaseRegles.activer. Les NaN se propagent partout
+
+
+
+# T-normes : deux tableaux de degrés (qui se diffusent) -> degré de la conjonction
+
+def t_norme_lukasiewicz(a, b):
+    return np.maximum(a + b - 1, 0.0)
+
+def t_norme_hamacher(a, b):
+    # produit de Hamacher, 0 quand les deux degrés sont nuls
+    produit = a * b
+    denominateur = a + b - produit
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominateur == 0, 0.0, produit / denominateur)
+
+def t_norme_einstein(a, b):
+    return a * b / (1 + (1 - a) * (1 - b))
+
+
+T_NORMES = {
+    "min": np.minimum,
+    "produit": np.multiply,
+    "proba": np.multiply,       # ancien nom du produit
+    "lukasiewicz": t_norme_lukasiewicz,
+    "hamacher": t_norme_hamacher,
+    "einstein": t_norme_einstein,
+}
+
+
+
+# S-normes : activations des règles (..., règles) rangées par conclusion et début de chaque segment de règles
+# -> activation de chaque conclusion (..., segments). Une règle qui ne se déclenche pas vaut 0, l'élément neutre
+
+def s_norme_max(activations, debuts):
+    # une règle par conclusion : rien à réunir
+    if len(debuts) == activations.shape[-1]:
+        return activations
+    return np.maximum.reduceat(activations, debuts, axis=-1)
+
+def s_norme_somme_probabiliste(activations, debuts):
+    # a + b - ab répété sur le segment = 1 - produit des (1 - a)
+    return 1 - np.multiply.reduceat(1 - activations, debuts, axis=-1)
+
+def s_norme_somme_bornee(activations, debuts):
+    return np.minimum(np.add.reduceat(activations, debuts, axis=-1), 1.0)
+
+
+S_NORMES = {
+    "max": s_norme_max,
+    "somme probabiliste": s_norme_somme_probabiliste,
+    "somme bornée": s_norme_somme_bornee,
+}
+
+
+def choisir_norme(normes:dict, nom:str):
+    """
+    Retourne le noyau d'une norme à partir de son nom.
+
+    Args:
+        normes (dict): T_NORMES ou S_NORMES.
+        nom (str): Nom de la norme.
+
+    Returns:
+        function: Le noyau, une erreur est levée si le nom est inconnu.
+    """
+    if nom not in normes:
+        raise ValueError(f"Norme inconnue : {nom}, au choix : {', '.join(normes)}.")
+    return normes[nom]
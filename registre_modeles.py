@@ -0,0 +1,307 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+
+from Renforcement_musculaire_SY10 import Entree_categorielle, Entree_nette, entrees_regles
+from calculs_lot import PARTIES
+from moteur_vectorise import MoteurVectorise, echantillonner_profils
+
+
+# Registre de modèles versionnés : plusieurs variantes des partitions et des règles de entrees_regles() (tests A/B,
+# réglages par salle...) décrites dans des fichiers JSON, compilées une seule fois en MoteurVectorise et servies par
+# identifiant de version. Le registre se recharge à chaud : les nouvelles versions sont compilées à part puis
+# remplacent les anciennes d'un seul coup, une évaluation en cours finit sur le moteur qu'elle a pris au départ
+#
+# Format d'un fichier (tout est optionnel, ce qui n'est pas donné reste celui de entrees_regles()) :
+# {
+#     "version": "salle-lyon",                                   (le nom du fichier sans extension par défaut)
+#     "entrees": {
+#         "IMC": {"univers": [10, 50, 1000], "partition": {"sous poids": [0, 0, 18.5, 20], ...}},
+#         "Génétique": {"categories": ["Mauvaise", "Normal", "Excellente"]}
+#     },
+#     "regles": {
+#         "regles SIF Nutrition 1": {"regles": [{"si": {"Conditions": "TPM", "Objectif Musculaire Maximum": "perte"},
+#                                               "alors": "DANGER"}, ...], "defaut": "PC",
+#                                    "t-norme": "produit", "s-norme": "somme probabiliste"}          (min et max par défaut)
+#     },
+#     "valeurs regression": {"valeurs nutrition": [-500, -400, -200, 0, 200, 400]},
+#     "parties": ["Biceps", "Triceps", "Quadriceps", ...],                (groupes musculaires, PARTIES par défaut)
+#     "programme": {"jours": 6, "séances par partie": 2}
+# }
+# Un jeu de règles donné remplace tout le jeu de règles d'origine, une entrée absente de "si" accepte toutes ses classes
+# floues (voir base_regles.py). Avec une s-norme autre que le max, le résultat est celui du jeu de règles écrit en entier
+# (une règle par combinaison de classes floues), sans le construire : les jokers, groupes et la conclusion par défaut
+# ne parcourent que les labels actifs de chaque ligne.
+# Pour modifier un fichier sans qu'il soit lu à moitié écrit, écrire un fichier temporaire puis le renommer (os.replace),
+# un fichier illisible garde de toute façon sa dernière version compilée
+
+
+# valeurs de régression -> SIF dont elles défuzzifient la sortie, pour vérifier leur nombre à la compilation
+SIF_REGRESSIONS = {
+    "valeurs nutrition": "SIF_nutrition_2",
+    "valeurs intensité possible": "SIF_intensite_possible",
+    "valeurs intensité nécessaire": "SIF_intensite_necessaire_2",
+}
+
+
+# nombre de profils évalués pour contrôler une version avant de la publier
+PROFILS_CONTROLE = 64
+
+
+def definition_par_defaut():
+    """
+    Définition complète du modèle de entrees_regles(), au format des fichiers du registre.
+
+    Returns:
+        dict: La définition, à enregistrer en JSON comme point de départ d'une nouvelle version.
+    """
+    d = entrees_regles()
+    definition = {"entrees": {}, "regles": {}, "valeurs regression": {}}
+    for cle, valeur in d.items():
+        if isinstance(valeur, Entree_nette):
+            univers = [float(valeur.univers[0]), float(valeur.univers[-1]), len(valeur.univers)]
+            definition["entrees"][cle] = {"nom": valeur.nom, "univers": univers, "partition": valeur.trapezes}
+        elif isinstance(valeur, Entree_categorielle):
+            definition["entrees"][cle] = {"nom": valeur.nom, "categories": list(valeur.partition)}
+        else:
+            definition["regles"][cle] = {"regles": [{"si": dict(conditions), "alors": conclusion} for conditions, conclusion in valeur.items()]}
+    for nom, attribut in MoteurVectorise.regressions.items():
+        definition["valeurs regression"][nom] = list(getattr(MoteurVectorise, attribut))
+    definition["parties"] = list(PARTIES)
+    definition["programme"] = {"jours": MoteurVectorise.jours, "séances par partie": MoteurVectorise.seances_max}
+    return definition
+
+
+def entrees_depuis_definition(definition:dict):
+    """
+    Applique une définition de modèle à entrees_regles().
+
+    Args:
+        definition (dict): Définition au format des fichiers du registre.
+
+    Returns:
+        tuple: Le dictionnaire des entrées et règles (avec ses conclusions par défaut dans "defauts")
+        et les valeurs de régression à donner à MoteurVectorise.
+    """
+    d = entrees_regles()
+
+    for cle, entree in definition.get("entrees", {}).items():
+        if cle not in d or cle.startswith("regles"):
+            raise ValueError(f"Entrée inconnue : {cle}")
+        ancienne = d[cle]
+        nom = entree.get("nom", ancienne.nom)
+        if "categories" in entree:
+            d[cle] = Entree_categorielle(nom, entree["categories"])
+            continue
+        if "univers" not in entree and not isinstance(ancienne, Entree_nette):
+            raise ValueError(f"L'entrée {cle} n'a pas d'univers, il faut en donner un avec sa partition.")
+        x1, x2, n = entree["univers"] if "univers" in entree else (ancienne.univers[0], ancienne.univers[-1], len(ancienne.univers))
+        if not x1 < x2 or int(n) < 2:
+            raise ValueError(f"L'univers de {cle} doit aller d'un minimum à un maximum plus grand avec au moins 2 points : {entree['univers']}")
+        partition = entree["partition"] if "partition" in entree else ancienne.trapezes
+        for label, coordonnees in partition.items():
+            if len(coordonnees) != 4 or list(coordonnees) != sorted(coordonnees):
+                raise ValueError(f"Le trapèze {label} de {cle} doit avoir 4 coordonnées croissantes : {coordonnees}")
+        d[cle] = Entree_nette(nom, (x1, x2, int(n)), partition)
+
+    d["defauts"] = {}
+    d["normes"] = {}
+    for cle, regles in definition.get("regles", {}).items():
+        if cle not in d or not cle.startswith("regles"):
+            raise ValueError(f"Jeu de règles inconnu : {cle}")
+        if isinstance(regles, dict):
+            if regles.get("defaut") is not None:
+                d["defauts"][cle] = regles["defaut"]
+            d["normes"][cle] = {norme: regles[norme] for norme in ("t-norme", "s-norme") if norme in regles}
+            if "regles" not in regles:
+                # seulement les normes ou la conclusion par défaut changent, on garde les règles d'origine
+                continue
+            regles = regles["regles"]
+        d[cle] = {tuple(regle["si"].items()): regle["alors"] for regle in regles}
+
+    valeurs_regression = definition.get("valeurs regression", {})
+    for nom in valeurs_regression:
+        if nom not in MoteurVectorise.regressions:
+            raise ValueError(f"Valeurs de régression inconnues : {nom}")
+    return d, valeurs_regression
+
+
+def compiler_definition(definition:dict):
+    """
+    Compile une définition de modèle en moteur prêt à évaluer.
+
+    Args:
+        definition (dict): Définition au format des fichiers du registre.
+
+    Returns:
+        MoteurVectorise: Le moteur, les règles incomplètes, les valeurs de régression dont le nombre
+        ne correspond pas aux conclusions ou un modèle qui ne donne aucun résultat valide sur un
+        échantillon de contrôle lèvent une ValueError ici plutot qu'à l'évaluation.
+    """
+    programme = definition.get("programme", {})
+    if not set(programme) <= {"jours", "séances par partie"}:
+        raise ValueError(f"Paramètres de programme inconnus : {sorted(set(programme) - {'jours', 'séances par partie'})}")
+    parties = definition.get("parties")
+    if parties is not None and (len(parties) == 0 or len(set(parties)) != len(parties)):
+        raise ValueError("Les parties doivent etre une liste non vide de noms distincts.")
+    moteur = MoteurVectorise(*entrees_depuis_definition(definition), parties=parties,
+                             jours=programme.get("jours"), seances_max=programme.get("séances par partie"))
+    for nom, sif in SIF_REGRESSIONS.items():
+        valeurs = getattr(moteur, MoteurVectorise.regressions[nom])
+        conclusions = getattr(moteur, sif).conclusions
+        if len(valeurs) != len(conclusions):
+            raise ValueError(f"{len(valeurs)} {nom} pour {len(conclusions)} conclusions {conclusions}.")
+
+    # évaluation de contrôle avant publication : un modèle dont aucun profil n'est valide est cassé
+    try:
+        resultats = moteur.evaluer(echantillonner_profils(PROFILS_CONTROLE, moteur, graine=0))
+    except Exception as erreur:
+        raise ValueError(f"Le modèle ne s'évalue pas : {erreur!r}") from erreur
+    if not resultats["Valide"].any():
+        raise ValueError(f"Aucun des {PROFILS_CONTROLE} profils de contrôle n'a de résultat valide.")
+    return moteur
+
+
+# empreinte du contenu d'une définition (hors identifiant de version) : deux versions identiques partagent leur moteur
+def _empreinte(definition:dict):
+    contenu = {cle: valeur for cle, valeur in definition.items() if cle != "version"}
+    return hashlib.sha256(json.dumps(contenu, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+
+##########################################################################################################################################
+
+
+
+# version compilée d'un modèle
+class Version:
+
+    def __init__(self, version:str, moteur:MoteurVectorise, empreinte:str, chemin:str):
+        self.version = version
+        self.moteur = moteur
+        self.empreinte = empreinte
+        self.chemin = chemin
+
+
+class RegistreModeles:
+
+    # dossier contenant les fichiers de définition, motif pour les sélectionner
+    # toutes les versions sont compilées dès la création, avant la première évaluation
+    def __init__(self, dossier:str, motif:str="*.json"):
+        self.dossier = dossier
+        self.motif = motif
+
+        # {version: Version}, jamais modifié sur place : un rechargement en construit un nouveau et remplace la référence
+        self._versions = {}
+        # erreurs du dernier rechargement {chemin: exception}
+        self.erreurs = {}
+
+        # un seul rechargement à la fois, les évaluations ne prennent jamais ce verrou
+        self._verrou = threading.Lock()
+        self._surveillance = None
+
+        self.recharger()
+
+    def versions(self):
+        return sorted(self._versions)
+
+    def moteur(self, version:str):
+        try:
+            return self._versions[version].moteur
+        except KeyError:
+            raise KeyError(f"Version de modèle inconnue : {version}") from None
+
+    def evaluer(self, version:str, profils:dict, parametres:dict=None):
+        """
+        Evalue un lot de profils avec une version du modèle.
+
+        Args:
+            version (str): Identifiant de la version.
+            profils (dict): Profils au format de MoteurVectorise.evaluer.
+            parametres (dict): Paramètres optionnels de MoteurVectorise.evaluer.
+
+        Returns:
+            dict: Les résultats de MoteurVectorise.evaluer.
+        """
+        # le moteur est pris une fois : un rechargement pendant l'évaluation ne la change pas
+        return self.moteur(version).evaluer(profils, parametres)
+
+    def recharger(self):
+        """
+        Relit les fichiers du dossier et compile les définitions nouvelles ou modifiées, puis remplace
+        toutes les versions d'un coup. Un fichier illisible ou invalide garde sa dernière version compilée.
+
+        Returns:
+            dict: {version: "ajoutée", "modifiée" ou "supprimée"} pour les versions qui ont changé.
+        """
+        with self._verrou:
+            actuelles = self._versions
+            compiles = {ancienne.empreinte: ancienne.moteur for ancienne in actuelles.values()}
+            nouvelles = {}
+            erreurs = {}
+
+            for chemin in sorted(glob.glob(os.path.join(self.dossier, self.motif))):
+                try:
+                    with open(chemin, encoding="utf-8") as fichier:
+                        definition = json.load(fichier)
+                    version = str(definition.get("version", os.path.splitext(os.path.basename(chemin))[0]))
+                    if version in nouvelles:
+                        raise ValueError(f"La version {version} est aussi définie dans {nouvelles[version].chemin}.")
+                    empreinte = _empreinte(definition)
+                    if empreinte not in compiles:
+                        compiles[empreinte] = compiler_definition(definition)
+                    nouvelles[version] = Version(version, compiles[empreinte], empreinte, chemin)
+                except Exception as erreur:
+                    # un fichier cassé, quelle que soit l'erreur, ne doit pas empecher de charger les autres
+                    erreurs[chemin] = erreur
+                    for ancienne in actuelles.values():
+                        if ancienne.chemin == chemin and ancienne.version not in nouvelles:
+                            nouvelles[ancienne.version] = ancienne
+
+            changements = {}
+            for version, nouvelle in nouvelles.items():
+                if version not in actuelles:
+                    changements[version] = "ajoutée"
+                elif actuelles[version].empreinte != nouvelle.empreinte:
+                    changements[version] = "modifiée"
+            for version in actuelles:
+                if version not in nouvelles:
+                    changements[version] = "supprimée"
+
+            # remplacement atomique : une évaluation voit soit toutes les anciennes versions soit toutes les nouvelles
+            self._versions = nouvelles
+            self.erreurs = erreurs
+        return changements
+
+    def surveiller(self, intervalle:float=2.0):
+        """
+        Recharge le registre toutes les intervalle secondes dans un thread en arrière plan.
+
+        Args:
+            intervalle (float): Temps entre deux rechargements, en secondes.
+        """
+        if self._surveillance is not None:
+            return
+        arret = threading.Event()
+
+        def boucle():
+            while not arret.wait(intervalle):
+                # un rechargement raté ne doit jamais arreter la surveillance, l'erreur est gardée avec celles des fichiers
+                try:
+                    self.recharger()
+                except Exception as erreur:
+                    self.erreurs = {**self.erreurs, self.dossier: erreur}
+
+        thread = threading.Thread(target=boucle, name="registre-modeles", daemon=True)
+        thread.start()
+        self._surveillance = (thread, arret)
+
+    def arreter(self):
+        if self._surveillance is None:
+            return
+        thread, arret = self._surveillance
+        arret.set()
+        thread.join()
+        self._surveillance = None
@@ -0,0 +1,157 @@
+import numpy as np
+
+from calculs_lot import UNIVERS, maintenance_lot
+from moteur_vectorise import MoteurVectorise
+
+
+# Simulation longitudinale : les profils des clients évoluent semaine après semaine (masse grasse, poids et donc IMC,
+# santé, objectifs...) et la chaine est relancée chaque semaine sur tous les clients à la fois. Seules les lignes
+# dont les entrées d'une étape ont changé depuis la semaine précédente sont recalculées pour cette étape
+
+
+# entrées des profils dont dépend chaque étape de la chaine
+ENTREES_ETAPES = {
+    "maintenance": ("Taille", "Poids", "Age", "Sexe", "Activité"),
+    "conditions": ("Masse grasse", "IMC"),
+    "objectifs": ("Objectifs",),
+    "nutrition": ("Objectif Masse Grasse",),
+    "intensité nécessaire": ("Génétiques", "Dopage", "Répondance"),
+    "intensité possible": ("Santés",),
+}
+
+
+def evolution_lineaire(derives:dict):
+    """
+    Evolution où chaque entrée varie d'une quantité fixe par semaine.
+
+    Args:
+        derives (dict): Variation hebdomadaire par clé des profils (ex: {"Masse grasse": -0.002, "Poids": 0.3}),
+            un scalaire ou un tableau qui se diffuse avec l'entrée (par client, par partie).
+
+    Returns:
+        function: evolution(semaine, etat) -> nouvel état, à donner à simuler.
+    """
+    def evolution(semaine, etat):
+        return {cle: etat[cle] + derives[cle] if cle in derives else etat[cle] for cle in etat}
+    return evolution
+
+
+# lignes (clients) dont au moins une des entrées a changé
+def _lignes_modifiees(avant:dict, apres:dict, cles):
+    modifiees = np.zeros(len(apres[cles[0]]), dtype=bool)
+    for cle in cles:
+        differences = np.asarray(avant[cle] != apres[cle])
+        modifiees |= differences.reshape(len(differences), -1).any(axis=1)
+    return modifiees
+
+
+def simuler(profils:dict, evolution, semaines:int=12, moteur:MoteurVectorise=None):
+    """
+    Simule l'évolution du plan de clients sur plusieurs semaines.
+
+    Args:
+        profils (dict): Profils initiaux au format de MoteurVectorise.evaluer, de forme (clients,).
+        evolution (function): evolution(semaine, etat) -> état de la semaine, l'état étant un dictionnaire de profils
+            (voir evolution_lineaire). Les entrées floues sont ramenées dans leur univers et l'IMC est recalculé
+            à partir du poids et de la taille comme dans main().
+        semaines (int): Nombre de semaines simulées (la semaine 0 est celle des profils initiaux).
+        moteur (MoteurVectorise): Moteur à utiliser, celui de entrees_regles() par défaut.
+
+    Returns:
+        dict: Séries (clients, semaines, ...) des apports caloriques, intensités réelles, programmes, poids,
+        masse grasse, IMC et validité, et nombre de lignes recalculées par étape sur toute la simulation.
+    """
+    moteur = MoteurVectorise() if moteur is None else moteur
+    # copie : une évolution qui modifie l'état sur place ne touche ni les profils donnés ni la semaine précédente
+    etat = {cle: np.array(valeur) for cle, valeur in profils.items()}
+    clients, parties = etat["Santés"].shape
+
+    series = None
+    recalculs = {etape: 0 for etape in ENTREES_ETAPES}
+    precedent = None
+
+    for semaine in range(semaines):
+        if semaine > 0:
+            etat = {cle: np.asarray(valeur) for cle, valeur in evolution(semaine, etat).items()}
+        for cle, nom in UNIVERS.items():
+            if cle in etat and cle != "IMC":
+                univers = moteur.d[nom].univers
+                etat[cle] = np.clip(etat[cle], univers[0], univers[-1])
+        etat["IMC"] = etat["Poids"] / (etat["Taille"] / 100) ** 2
+
+        if precedent is None:
+            # premiere semaine : tout est calculé
+            tout = np.ones(clients, dtype=bool)
+            modifiees = {etape: tout for etape in ENTREES_ETAPES}
+            maintenance = np.empty(clients)
+            conditions = np.empty((clients, len(moteur.SIF_conditions.conclusions)))
+            objectifs = np.empty((clients, parties, len(moteur.d["Objectif Musculaire"].partition)))
+            objectif_max = np.empty((clients, objectifs.shape[-1]))
+            augmentation = np.empty(clients)
+            danger = np.empty(clients, dtype=bool)
+            intensites_nec = np.empty((clients, parties))
+            intensites_pos = np.empty((clients, parties))
+            apports_precedents = np.full(clients, np.nan)
+        else:
+            modifiees = {etape: _lignes_modifiees(precedent, etat, cles) for etape, cles in ENTREES_ETAPES.items()}
+
+        # propagation des changements vers les étapes qui dépendent des sorties d'autres étapes
+        modifiees["nutrition"] = modifiees["nutrition"] | modifiees["conditions"] | modifiees["objectifs"]
+        modifiees["intensité nécessaire"] = modifiees["intensité nécessaire"] | modifiees["objectifs"]
+
+        m = modifiees["maintenance"]
+        if m.any():
+            maintenance[m] = maintenance_lot(etat["Taille"][m], etat["Poids"][m], etat["Age"][m], etat["Sexe"][m], etat["Activité"][m])
+
+        m = modifiees["conditions"]
+        if m.any():
+            conditions[m] = moteur.conditions(etat["Masse grasse"][m], etat["IMC"][m])
+
+        m = modifiees["objectifs"]
+        if m.any():
+            objectifs[m], objectif_max[m] = moteur.objectifs(etat["Objectifs"][m])
+
+        m = modifiees["nutrition"]
+        if m.any():
+            augmentation[m], danger[m] = moteur.nutrition(conditions[m], objectif_max[m], etat["Objectif Masse Grasse"][m])
+
+        m = modifiees["intensité nécessaire"]
+        if m.any():
+            impact_dopage = np.where(etat["Dopage"][m], etat["Répondance"][m], 0)
+            intensites_nec[m] = moteur.intensite_necessaire(etat["Génétiques"][m], objectifs[m], impact_dopage)
+
+        # l'intensité possible dépend aussi des apports caloriques calculés plus haut
+        apports_caloriques = maintenance + augmentation
+        # NaN (clients non valides) comparé à NaN n'est pas un changement
+        memes_apports = (apports_caloriques == apports_precedents) | (np.isnan(apports_caloriques) & np.isnan(apports_precedents))
+        m = modifiees["intensité possible"] | ~memes_apports
+        modifiees["intensité possible"] = m
+        if m.any():
+            intensites_pos[m] = moteur.intensite_possible(etat["Santés"][m], apports_caloriques[m])
+        apports_precedents = apports_caloriques
+
+        for etape, lignes in modifiees.items():
+            recalculs[etape] += int(lignes.sum())
+
+        resultats = moteur.resultats(maintenance, augmentation, danger, intensites_nec, intensites_pos)
+        if series is None:
+            jours = resultats["Programme parties"].shape[-1]
+            series = {
+                "Apports caloriques": np.empty((clients, semaines), dtype=np.float32),
+                "Intensités réelles": np.empty((clients, semaines, parties), dtype=np.float32),
+                "Programme parties": np.empty((clients, semaines, jours), dtype=np.int16),
+                "Programme niveaux": np.empty((clients, semaines, jours), dtype=np.int8),
+                "Poids": np.empty((clients, semaines), dtype=np.float32),
+                "Masse grasse": np.empty((clients, semaines), dtype=np.float32),
+                "IMC": np.empty((clients, semaines), dtype=np.float32),
+                "Valide": np.empty((clients, semaines), dtype=bool),
+            }
+        for cle in ("Apports caloriques", "Intensités réelles", "Programme parties", "Programme niveaux", "Valide"):
+            series[cle][:, semaine] = resultats[cle]
+        for cle in ("Poids", "Masse grasse", "IMC"):
+            series[cle][:, semaine] = etat[cle]
+
+        precedent = {cle: valeur.copy() for cle, valeur in etat.items()}
+
+    series["Recalculs"] = recalculs
+    return series
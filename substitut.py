@@ -0,0 +1,400 @@
+import json
+import math
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+from calculs_lot import (coder_lot, macronutriments_lot, macronutriments_profil, maintenance_lot, maintenance_profil,
+                         objectif_maximum_lot, objectif_maximum_profil, programme_lot, programme_profil)
+
+
+# Modèle substitut de la chaine complète pour les aperçus instantanés : chaque étage de la chaine est remplacé
+# par une table interpolée linéairement par morceaux sur une grille de l'espace des profils. Le modèle tient dans
+# un seul fichier .npz et s'évalue avec NumPy seul, sans skfuzzy (le moteur exact n'est importé que pour le distiller)
+
+
+# clés des tables du modèle -> noms des axes de leur grille
+TABLES = {
+    "Objectifs normalisés": ("Objectif",),
+    "Augmentation": ("Objectif maximum", "Masse grasse", "IMC", "Objectif Masse Grasse"),
+    "Danger": ("Objectif maximum", "Masse grasse", "IMC", "Objectif Masse Grasse"),
+    "Intensités nécessaires": ("Génétique", "Impact du dopage", "Objectif"),
+    "Intensités possibles": ("Apports caloriques", "Santé"),
+}
+
+# entrées des profils qui ont une valeur par partie
+PAR_PARTIE = ("Objectifs", "Génétiques", "Santés")
+
+# entrée de entrees_regles() dont l'univers (et les trapèzes) définissent chaque axe continu
+ENTREES_AXES = {
+    "Masse grasse": "Masse grasse",
+    "IMC": "IMC",
+    "Objectif Masse Grasse": "Objectif Masse Grasse",
+    "Objectif": "Objectif Musculaire",
+    "Santé": "Santé",
+    "Apports caloriques": "Apports caloriques",
+}
+
+
+def interpoler(axes:list, table, *coordonnees):
+    """
+    Interpolation multilinéaire dans une table définie sur une grille.
+
+    Args:
+        axes (list): Noeuds croissants de la grille sur chaque axe.
+        table (array): Valeurs aux noeuds (G1, ..., Gn, ...), les dimensions en plus sont interpolées ensemble.
+        coordonnees (array): Une coordonnée par axe, de formes diffusables entre elles.
+
+    Returns:
+        array: Les valeurs interpolées, NaN hors de la grille.
+    """
+    coordonnees = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in coordonnees])
+    n = len(axes)
+    forme = coordonnees[0].shape
+    supplementaires = (1,) * (table.ndim - n)
+
+    indices, poids = [], []
+    dehors = np.zeros(forme, dtype=bool)
+    for k, (axe, x) in enumerate(zip(axes, coordonnees)):
+        j = np.clip(np.searchsorted(axe, x, side="right") - 1, 0, len(axe) - 2)
+        # les deux noeuds qui encadrent x, sur un axe de coins propre à cet axe de la grille
+        decalage = np.arange(2).reshape((1,) * k + (2,) + (1,) * (n - 1 - k) + (1,) * len(forme))
+        indices.append(j + decalage)
+        poids.append(((x - axe[j]) / (axe[j + 1] - axe[j])).reshape(forme + supplementaires))
+        dehors |= ~((x >= axe[0]) & (x <= axe[-1]))
+
+    # tous les coins en une seule lecture de la table, puis réduction axe par axe
+    # v0 + t * (v1 - v0) redonne exactement v0 sur un plateau, ce qui compte pour les seuils de generer_programme
+    valeurs = table[tuple(indices)]
+    for t in poids:
+        valeurs = np.where(t > 0, valeurs[0] + t * (valeurs[1] - valeurs[0]), valeurs[0])
+
+    return np.where(dehors.reshape(forme + supplementaires), np.nan, valeurs)
+
+
+def interpoler_point(axes:list, pas:list, coins:list, valeurs:list, *coordonnees, bloc:int=1):
+    """
+    Interpolation multilinéaire d'un seul point par arithmétique d'indices sur la table aplatie,
+    sans la diffusion de interpoler et avec le meme résultat au bit près.
+
+    Args:
+        axes (list): Noeuds croissants de la grille sur chaque axe, en listes Python.
+        pas (list): Ecart dans valeurs entre deux noeuds voisins de chaque axe.
+        coins (list): Ecarts des coins de la cellule à son premier coin, alternant noeud j et j + 1
+            du premier axe, puis du suivant... (voir coins_cellule).
+        valeurs (list): Valeurs aux noeuds, table aplatie en liste Python.
+        coordonnees (float): Une coordonnée par axe.
+        bloc (int): Nombre de valeurs par noeud (produit des dimensions en plus de la table).
+
+    Returns:
+        list: Les bloc valeurs interpolées, NaN hors de la grille.
+    """
+    debut = 0
+    poids = []
+    for axe, ecart, x in zip(axes, pas, coordonnees):
+        if not axe[0] <= x <= axe[-1]:
+            return [math.nan] * bloc
+        j = bisect_right(axe, x) - 1
+        if j > len(axe) - 2:
+            j = len(axe) - 2
+        poids.append((x - axe[j]) / (axe[j + 1] - axe[j]))
+        debut += j * ecart
+
+    # réduction dans le meme ordre que interpoler, le premier axe d'abord
+    if bloc == 1:
+        v = [valeurs[debut + coin] for coin in coins]
+        for t in poids:
+            v = [v0 + t * (v1 - v0) for v0, v1 in zip(v[0::2], v[1::2])] if t > 0 else v[0::2]
+        return v
+    v = [valeurs[debut + coin:debut + coin + bloc] for coin in coins]
+    for t in poids:
+        v = [[a + t * (b - a) for a, b in zip(v0, v1)] for v0, v1 in zip(v[0::2], v[1::2])] if t > 0 else v[0::2]
+    return v[0]
+
+
+def coins_cellule(pas:list):
+    coins = [0]
+    for ecart in pas:
+        coins += [coin + ecart for coin in coins]
+    return coins
+
+
+
+class ModeleSubstitut:
+
+    # axes : {nom d'axe: noeuds}, tables : {clé de TABLES: valeurs aux noeuds}, infos : métadonnées JSON
+    def __init__(self, axes:dict, tables:dict, infos:dict):
+        self.axes = {nom: np.asarray(noeuds, dtype=float) for nom, noeuds in axes.items()}
+        self.tables = {nom: np.asarray(table) for nom, table in tables.items()}
+        self.infos = infos
+        # tables aplaties en listes Python pour le chemin d'un seul profil (interpoler_point)
+        self._plates = {}
+        for nom, axes in TABLES.items():
+            table = np.ascontiguousarray(self.tables[nom], dtype=float)
+            bloc = int(np.prod(table.shape[len(axes):]))
+            pas = [ecart // table.itemsize for ecart in table.strides[:len(axes)]]
+            self._plates[nom] = ([self.axes[axe].tolist() for axe in axes], pas, coins_cellule(pas), table.ravel().tolist(), bloc)
+
+    @classmethod
+    def charger(cls, chemin:str):
+        with np.load(chemin, allow_pickle=False) as fichier:
+            infos = json.loads(str(fichier["infos"]))
+            axes = {nom: fichier["axe " + nom] for nom in infos["axes"]}
+            tables = {nom: fichier["table " + nom] for nom in TABLES}
+        return cls(axes, tables, infos)
+
+    def enregistrer(self, chemin:str):
+        infos = dict(self.infos, axes=list(self.axes))
+        np.savez_compressed(chemin,
+                            infos=np.array(json.dumps(infos, ensure_ascii=False)),
+                            **{"axe " + nom: noeuds for nom, noeuds in self.axes.items()},
+                            **{"table " + nom: table for nom, table in self.tables.items()})
+
+    def _interpoler(self, nom:str, *coordonnees):
+        return interpoler([self.axes[axe] for axe in TABLES[nom]], self.tables[nom], *coordonnees)
+
+    def _interpoler_point(self, nom:str, *coordonnees):
+        axes, pas, coins, valeurs, bloc = self._plates[nom]
+        return interpoler_point(axes, pas, coins, valeurs, *coordonnees, bloc=bloc)
+
+    # codes entiers d'une entrée catégorielle (axe de la grille), vérifiés comme Entree_categorielle.coder
+    def _verifier_codes(self, axe:str, valeurs):
+        coder_lot(axe, valeurs, len(self.axes[axe]))
+
+    # meme vérification pour un code seul (int ou float Python) : coder_lot n'est appelé que pour lever l'erreur
+    def _verifier_code(self, axe:str, code):
+        if isinstance(code, bool) or not isinstance(code, (int, float)) or not 0 <= code <= len(self.axes[axe]) - 1 or code % 1:
+            coder_lot(axe, code, len(self.axes[axe]))
+
+    def evaluer(self, profils:dict):
+        """
+        Evalue le substitut sur un lot de profils, avec les entrées et les sorties de MoteurVectorise.evaluer.
+        Un profil seul (entrées scalaires, une valeur par partie) passe par un chemin sans diffusion, au meme résultat.
+
+        Args:
+            profils (dict): Profils au format de MoteurVectorise.evaluer.
+
+        Returns:
+            dict: Maintenance, apports caloriques, macronutriments, intensités, programme, Danger et Valide.
+        """
+        if all(np.ndim(valeur) == (cle in PAR_PARTIE) for cle, valeur in profils.items()):
+            return self._evaluer_profil(profils)
+
+        p = {cle: np.asarray(valeur) for cle, valeur in profils.items()}
+        parties = self.infos["parties"]
+        for cle in PAR_PARTIE:
+            if p[cle].shape[-1:] != (len(parties),):
+                raise ValueError(f"{cle} doit avoir une colonne par partie {parties}, forme reçue {p[cle].shape}.")
+        self._verifier_codes("Génétique", p["Génétiques"])
+        # sans dopage l'impact est "Aucun impact", ce qui correspond à la valeur 0
+        impact_dopage = np.where(p["Dopage"], p["Répondance"], 0)
+        self._verifier_codes("Impact du dopage", impact_dopage)
+
+        # calcul_maintenance est une formule fermée, le substitut la calcule exactement
+        maintenance = maintenance_lot(p["Taille"], p["Poids"], p["Age"], p["Sexe"], p["Activité"])
+        imc = p["IMC"] if "IMC" in p else p["Poids"] / (p["Taille"] / 100) ** 2
+
+        # objectif musculaire maximum (trouver_maximum_prioritaire_alpha) à partir des objectifs normalisés tabulés
+        objectifs = self._interpoler("Objectifs normalisés", p["Objectifs"])
+        partition = self.infos["partition objectif"]
+        objectif_max = objectif_maximum_lot(objectifs, partition, self.infos["ordre priorité"], self.infos["alpha"])
+        categorie = np.where(objectif_max.any(axis=-1), objectif_max.argmax(axis=-1), np.nan)
+
+        grille_nutrition = (categorie, p["Masse grasse"], imc, p["Objectif Masse Grasse"])
+        augmentation = self._interpoler("Augmentation", *grille_nutrition)
+        with np.errstate(invalid="ignore"):
+            danger = self._interpoler("Danger", *grille_nutrition) > 0.5
+        apports_caloriques = maintenance + augmentation
+
+        intensites_nec = self._interpoler("Intensités nécessaires", p["Génétiques"], impact_dopage[..., None], p["Objectifs"])
+        intensites_pos = self._interpoler("Intensités possibles", apports_caloriques[..., None], p["Santés"])
+        intensites_reelles = np.minimum(intensites_pos, intensites_nec)
+
+        valide = ~danger & np.isfinite(apports_caloriques) & np.isfinite(intensites_reelles).all(axis=-1)
+        apports_caloriques = np.where(valide, apports_caloriques, np.nan)
+        intensites_reelles = np.where(valide[..., None], intensites_reelles, np.nan)
+        programme_parties, programme_niveaux = programme_lot(intensites_reelles, self.infos.get("jours", 6), self.infos.get("séances max", 2))
+
+        return {
+            "Maintenance": maintenance,
+            "Augmentation": augmentation,
+            "Apports caloriques": apports_caloriques,
+            **macronutriments_lot(apports_caloriques),
+            "Intensités réelles": intensites_reelles,
+            "Programme parties": programme_parties,
+            "Programme niveaux": programme_niveaux,
+            "Danger": danger,
+            "Valide": valide
+        }
+
+    # chaine d'un seul profil en Python pur sur les tables aplaties, comme evaluer au bit près
+    def _evaluer_profil(self, p:dict):
+        # listes Python (tolist convertit aussi les scalaires NumPy)
+        objectifs_nets, genetiques, santes = (np.asarray(p[cle]).tolist() for cle in PAR_PARTIE)
+        parties = self.infos["parties"]
+        for cle, valeurs in zip(PAR_PARTIE, (objectifs_nets, genetiques, santes)):
+            if len(valeurs) != len(parties):
+                raise ValueError(f"{cle} doit avoir une colonne par partie {parties}, forme reçue ({len(valeurs)},).")
+        for code in genetiques:
+            self._verifier_code("Génétique", code)
+        impact_dopage = np.asarray(p["Répondance"]).tolist() if p["Dopage"] else 0
+        self._verifier_code("Impact du dopage", impact_dopage)
+
+        taille, poids = float(p["Taille"]), float(p["Poids"])
+        maintenance = maintenance_profil(taille, poids, float(p["Age"]), str(p["Sexe"]), np.asarray(p["Activité"]).tolist())
+        imc = float(p["IMC"]) if "IMC" in p else poids / (taille / 100) ** 2
+
+        objectifs = [self._interpoler_point("Objectifs normalisés", x) for x in objectifs_nets]
+        categorie = objectif_maximum_profil(objectifs, self.infos["partition objectif"], self.infos["ordre priorité"], self.infos["alpha"])
+        categorie = math.nan if categorie is None else float(categorie)
+
+        grille_nutrition = (categorie, float(p["Masse grasse"]), imc, float(p["Objectif Masse Grasse"]))
+        augmentation, = self._interpoler_point("Augmentation", *grille_nutrition)
+        danger = self._interpoler_point("Danger", *grille_nutrition)[0] > 0.5
+        apports_caloriques = maintenance + augmentation
+
+        intensites_reelles = []
+        for genetique, objectif, sante in zip(genetiques, objectifs_nets, santes):
+            necessaire, = self._interpoler_point("Intensités nécessaires", genetique, impact_dopage, objectif)
+            possible, = self._interpoler_point("Intensités possibles", apports_caloriques, sante)
+            # np.minimum : un NaN l'emporte
+            intensites_reelles.append(math.nan if math.isnan(possible) or math.isnan(necessaire) else min(possible, necessaire))
+
+        valide = not danger and math.isfinite(apports_caloriques) and all(math.isfinite(x) for x in intensites_reelles)
+        if not valide:
+            apports_caloriques = math.nan
+            intensites_reelles = [math.nan] * len(intensites_reelles)
+
+        programme_parties, programme_niveaux = programme_profil(intensites_reelles, self.infos.get("jours", 6),
+                                                                self.infos.get("séances max", 2))
+
+        return {
+            "Maintenance": maintenance,
+            "Augmentation": augmentation,
+            "Apports caloriques": apports_caloriques,
+            **macronutriments_profil(apports_caloriques),
+            "Intensités réelles": np.array(intensites_reelles),
+            "Programme parties": np.array(programme_parties, dtype=np.int16),
+            "Programme niveaux": np.array(programme_niveaux, dtype=np.int8),
+            "Danger": danger,
+            "Valide": valide
+        }
+
+
+
+##########################################################################################################################################
+
+
+
+# noeuds d'un axe : les sommets des trapèzes dans l'univers plus une subdivision régulière
+def _noeuds(entree, points_par_axe:int):
+    sommets = np.array(list(entree.trapezes.values()), dtype=float).ravel()
+    debut, fin = entree.univers[0], entree.univers[-1]
+    sommets = sommets[(sommets >= debut) & (sommets <= fin)]
+    return np.unique(np.concatenate([np.linspace(debut, fin, points_par_axe), sommets]))
+
+
+def certifier(modele:ModeleSubstitut, moteur, profils:dict):
+    """
+    Compare le substitut au moteur exact sur un échantillon de profils.
+
+    Args:
+        modele (ModeleSubstitut): Le substitut.
+        moteur (MoteurVectorise): Le moteur exact.
+        profils (dict): Echantillon de profils, qui ne doit pas avoir servi à construire le substitut.
+
+    Returns:
+        dict: Erreurs max et moyenne des apports caloriques et des intensités réelles sur les profils valides
+        pour les deux, taux de désaccord sur la validité, taux de programmes identiques et latence moyenne
+        d'un profil seul pour le substitut et pour le moteur exact, en microsecondes.
+    """
+    exact = moteur.evaluer(profils)
+    approche = modele.evaluer(profils)
+    valides = exact["Valide"] & approche["Valide"]
+
+    rapport = {}
+    for nom in ("Apports caloriques", "Intensités réelles"):
+        erreurs = np.abs(exact[nom][valides] - approche[nom][valides])
+        rapport[nom] = {"erreur max": float(erreurs.max(initial=0.0)), "erreur moyenne": float(erreurs.mean()) if erreurs.size else 0.0}
+
+    memes_programmes = (exact["Programme parties"] == approche["Programme parties"]).all(axis=-1) & \
+                       (exact["Programme niveaux"] == approche["Programme niveaux"]).all(axis=-1)
+    rapport["désaccord validité"] = float((exact["Valide"] != approche["Valide"]).mean())
+    rapport["programmes identiques"] = float(memes_programmes[valides].mean()) if valides.any() else 1.0
+    rapport["profils"] = int(len(valides))
+
+    # latence d'un aperçu : les profils un par un, le moteur exact sur moins de profils car il est bien plus lent
+    un_par_un = [{cle: np.asarray(valeur)[i] for cle, valeur in profils.items()} for i in range(min(len(valides), 200))]
+    rapport["latence substitut (µs)"] = _latence(modele.evaluer, un_par_un)
+    rapport["latence moteur (µs)"] = _latence(moteur.evaluer, un_par_un[:20])
+    return rapport
+
+
+# temps moyen d'évaluation d'un profil seul, en microsecondes
+def _latence(evaluer, profils:list):
+    debut = time.perf_counter()
+    for profil in profils:
+        evaluer(profil)
+    return (time.perf_counter() - debut) / len(profils) * 1e6
+
+
+def distiller(moteur=None, points_par_axe:int=48, n_certification:int=20000, graine=None):
+    """
+    Construit le substitut d'un moteur en tabulant chaque étage de la chaine sur sa grille, puis le certifie.
+
+    Args:
+        moteur (MoteurVectorise): Le moteur exact, celui de entrees_regles() par défaut.
+        points_par_axe (int): Nombre de points réguliers par axe continu, en plus des sommets des trapèzes.
+        n_certification (int): Nombre de profils tirés pour mesurer l'erreur.
+        graine (int): Graine du tirage des profils de certification.
+
+    Returns:
+        tuple: (ModeleSubstitut, rapport de certifier).
+    """
+    from moteur_vectorise import MoteurVectorise, echantillonner_profils, fuzzifier_lot, normaliser_lot
+
+    moteur = MoteurVectorise() if moteur is None else moteur
+    d = moteur.d
+
+    axes = {nom: _noeuds(d[cle], points_par_axe) for nom, cle in ENTREES_AXES.items()}
+    partition_objectif = list(d["Objectif Musculaire"].partition)
+    axes["Objectif maximum"] = np.arange(len(partition_objectif), dtype=float)
+    axes["Génétique"] = np.arange(len(d["Génétique"].partition), dtype=float)
+    axes["Impact du dopage"] = np.arange(len(d["Impact du dopage"].partition), dtype=float)
+
+    # les objectifs normalisés sont tabulés sur l'univers lui meme, la fuzzification y est exactement linéaire par morceaux
+    axes["Objectif"] = d["Objectif Musculaire"].univers
+    objectifs = normaliser_lot(fuzzifier_lot(d["Objectif Musculaire"], axes["Objectif"]))
+
+    # SIF Conditions + Nutrition pour chaque catégorie d'objectif maximum : (catégories, masse grasse, IMC, objectif MG)
+    conditions = moteur.conditions(axes["Masse grasse"][:, None], axes["IMC"][None, :])
+    objectif_max = np.eye(len(partition_objectif))[:, None, None, None, :]
+    augmentation, danger = moteur.nutrition(conditions[None, :, :, None, :], objectif_max, axes["Objectif Masse Grasse"])
+
+    # intensité nécessaire : (génétique, dopage, objectif), l'axe des objectifs tient lieu d'axe des parties
+    intensites_nec = moteur.intensite_necessaire(axes["Génétique"][:, None, None], objectifs[None, None],
+                                                 axes["Impact du dopage"][None, :])
+
+    # intensité possible : (apports, santé), l'axe des santés tient lieu d'axe des parties
+    intensites_pos = moteur.intensite_possible(axes["Santé"][None, :], axes["Apports caloriques"])
+
+    infos = {
+        "parties": list(moteur.parties),
+        "jours": moteur.jours,
+        "séances max": moteur.seances_max,
+        "partition objectif": partition_objectif,
+        "ordre priorité": list(moteur.ordre_priorite),
+        "alpha": moteur.alpha,
+    }
+    tables = {
+        "Objectifs normalisés": objectifs,
+        "Augmentation": augmentation,
+        "Danger": danger.astype(float),
+        "Intensités nécessaires": intensites_nec,
+        "Intensités possibles": intensites_pos,
+    }
+    modele = ModeleSubstitut(axes, tables, infos)
+
+    profils = echantillonner_profils(n_certification, moteur, graine)
+    return modele, certifier(modele, moteur, profils)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+
+# les modules du projet sont à la racine du dépot
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
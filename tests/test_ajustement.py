@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from ajustement import Ajustement, EspaceParametres, moteur_depuis_modele
+from moteur_vectorise import MoteurVectorise, echantillonner_profils
+
+
+# Le cout d'un candidat est celui des résultats du moteur, et un modèle ajusté se recharge dans un moteur équivalent
+
+
+@pytest.fixture(scope="module")
+def moteur_12_parties():
+    return MoteurVectorise(parties=[f"G{i}" for i in range(12)])
+
+
+# cout calculé directement à partir des résultats d'un moteur, comme Ajustement.couts pour un seul candidat
+def cout_direct(resultats:dict, cibles:dict, echelles:dict, penalite:float):
+    total, observations = 0.0, 0
+    for nom, observe in cibles.items():
+        predit = resultats[nom]
+        erreurs = np.where(np.isfinite(predit), ((predit - observe) / echelles[nom]) ** 2, penalite)
+        total += np.where(np.isfinite(observe), erreurs, 0.0).sum()
+        observations += int(np.isfinite(observe).sum())
+    return total / observations
+
+
+def test_cout_initial_comme_evaluer():
+    moteur = MoteurVectorise()
+    profils = echantillonner_profils(300, moteur, graine=0)
+    resultats = moteur.evaluer(profils)
+    rng = np.random.default_rng(0)
+    cibles = {"Apports caloriques": resultats["Apports caloriques"] + rng.normal(0, 100, 300),
+              "Intensités réelles": resultats["Intensités réelles"] + rng.normal(0, 2, (300, 4))}
+
+    ajustement = Ajustement(profils, cibles, noms=("IMC", "Santé", "valeurs nutrition", "valeurs intensité possible"), moteur=moteur)
+    attendu = cout_direct(resultats, ajustement.cibles, ajustement.echelles, ajustement.penalite)
+    assert ajustement.couts(ajustement.espace.initial[None])[0] == pytest.approx(attendu, rel=1e-9)
+
+
+def test_projeter_garde_les_trapezes_ordonnes():
+    espace = EspaceParametres(MoteurVectorise(), ("IMC", "Masse grasse", "valeurs nutrition"))
+    rng = np.random.default_rng(1)
+    vecteurs = espace.initial + 5 * espace.ecarts_initiaux * rng.standard_normal((200, len(espace.initial)))
+
+    projetes = espace.projeter(vecteurs)
+    assert ((projetes >= espace.bornes[:, 0]) & (projetes <= espace.bornes[:, 1])).all()
+    for nom, trapezes in espace._blocs(projetes).items():
+        if nom in espace.labels:
+            assert (np.diff(trapezes, axis=-1) >= 0).all()
+    # un vecteur déjà admissible ne bouge pas
+    np.testing.assert_array_equal(espace.projeter(espace.initial), espace.initial)
+
+
+def test_ajuster_un_decalage_connu(moteur_12_parties):
+    profils = echantillonner_profils(200, moteur_12_parties, graine=2)
+    resultats = moteur_12_parties.evaluer(profils)
+    # des apports observés 150 kcal au dessus : atteignable en décalant toutes les valeurs nutrition
+    cibles = {"Apports caloriques": resultats["Apports caloriques"] + 150}
+
+    ajustement = Ajustement(profils, cibles, noms=("valeurs nutrition",), moteur=moteur_12_parties)
+    ajuste = ajustement.ajuster(n_candidats=32, n_iterations=15, graine=0)
+    assert ajuste["cout"] < 0.5 * ajuste["cout initial"]
+
+    # le modèle exporté redonne le meme cout, avec les parties du moteur de départ
+    moteur = moteur_depuis_modele(ajuste["modele"], moteur_12_parties)
+    assert moteur.parties == moteur_12_parties.parties
+    recalcule = cout_direct(moteur.evaluer(profils), ajustement.cibles, ajustement.echelles, ajustement.penalite)
+    assert recalcule == pytest.approx(ajuste["cout"], rel=1e-9)
@@ -0,0 +1,211 @@
+import functools
+import itertools
+
+import numpy as np
+import pytest
+
+from Renforcement_musculaire_SY10 import SystemeFlou, entrees_regles
+from base_regles import JOKER, BaseRegles
+from normes import S_NORMES, T_NORMES
+
+
+# Equivalence de BaseRegles (jokers, conclusions par défaut, groupes de labels, élagage des règles)
+# avec les memes règles écrites en entier : une règle par combinaison de classes floues
+
+
+def base_aleatoire(rng, complete:bool):
+    """
+    Tire une base de règles creuse : des entrées de 2 à 4 labels et des règles dont chaque condition
+    peut etre omise ou un joker. Une base complete reçoit une règle écrite pour chaque combinaison non couverte.
+    """
+    n_entrees = int(rng.integers(2, 4))
+    noms = [f"E{i}" for i in range(n_entrees)]
+    labels = [[f"l{j}" for j in range(rng.integers(2, 5))] for _ in noms]
+    conclusions = ["A", "B", "C"]
+
+    regles = {}
+    for _ in range(rng.integers(1, 8)):
+        conditions = []
+        for nom, labels_entree in zip(noms, labels):
+            tirage = rng.random()
+            if tirage < 0.2:
+                conditions.append((nom, JOKER))
+            elif tirage < 0.6:
+                conditions.append((nom, str(rng.choice(labels_entree))))
+        regles[tuple(conditions)] = str(rng.choice(conclusions))
+
+    if complete:
+        for combinaison in itertools.product(*[range(len(l)) for l in labels]):
+            if not regles_couvrantes(noms, labels, regles, combinaison):
+                regles[tuple((nom, labels[i][j]) for i, (nom, j) in enumerate(zip(noms, combinaison)))] = str(rng.choice(conclusions))
+    return noms, labels, regles
+
+
+# conclusions des règles qui couvrent une combinaison d'indices de labels
+def regles_couvrantes(noms, labels, regles, combinaison):
+    conclusions = []
+    for conditions, conclusion in regles.items():
+        conditions = dict(conditions)
+        if all(conditions.get(nom, JOKER) in (JOKER, labels[i][j]) for i, (nom, j) in enumerate(zip(noms, combinaison))):
+            conclusions.append(conclusion)
+    return conclusions
+
+
+# s-normes de deux activations pour la référence en boucle
+S_NORMES_BINAIRES = {
+    "max": np.maximum,
+    "somme probabiliste": lambda a, b: a + b - a * b,
+    "somme bornée": lambda a, b: np.minimum(a + b, 1.0),
+}
+
+
+def activations_denses(noms, labels, regles, defaut, degres, t_norme, s_norme:str="max"):
+    """
+    Référence : chaque combinaison de classes floues prend les conclusions des règles qui la couvrent
+    (ou la conclusion par défaut), puis t-norme des conditions et s-norme des règles de chaque conclusion, en boucle.
+    """
+    activations = {}
+    for combinaison in itertools.product(*[range(len(l)) for l in labels]):
+        conclusions = regles_couvrantes(noms, labels, regles, combinaison) or [defaut]
+        activation = functools.reduce(t_norme, [degres[i][..., j] for i, j in enumerate(combinaison)])
+        for conclusion in set(conclusions):
+            activations[conclusion] = S_NORMES_BINAIRES[s_norme](activations.get(conclusion, 0.0), activation)
+    return activations
+
+
+def degres_aleatoires(rng, labels, lignes:int=50):
+    # des degrés nuls pour que l'élagage des règles compte
+    degres = []
+    for labels_entree in labels:
+        degre = rng.random((lignes, len(labels_entree)))
+        degres.append(np.where(rng.random(degre.shape) < 0.4, 0.0, degre))
+    return degres
+
+
+@pytest.mark.parametrize("t_norme", T_NORMES.values(), ids=T_NORMES.keys())
+@pytest.mark.parametrize("complete", [True, False])
+def test_equivalence_regles_denses(complete, t_norme):
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        noms, labels, regles = base_aleatoire(rng, complete)
+        defaut = None if complete else "D"
+        base = BaseRegles(noms, labels, regles, defaut)
+        degres = degres_aleatoires(rng, labels)
+
+        obtenues = base.activer(degres, t_norme)
+        attendues = activations_denses(noms, labels, regles, defaut, degres, t_norme)
+        for k, conclusion in enumerate(base.conclusions):
+            np.testing.assert_array_equal(obtenues[..., k], attendues.get(conclusion, 0.0))
+
+
+@pytest.mark.parametrize("s_norme", ["somme probabiliste", "somme bornée"])
+@pytest.mark.parametrize("t_norme", [np.minimum, np.multiply])
+def test_equivalence_regles_denses_autres_s_normes(t_norme, s_norme):
+    # les jokers et les groupes ne sont plus des max : la base est évaluée comme ses règles écrites en entier
+    rng = np.random.default_rng(2)
+    for _ in range(100):
+        noms, labels, regles = base_aleatoire(rng, complete=False)
+        base = BaseRegles(noms, labels, regles, "D")
+        degres = degres_aleatoires(rng, labels)
+
+        obtenues = base.activer(degres, t_norme, s_norme=S_NORMES[s_norme])
+        attendues = activations_denses(noms, labels, regles, "D", degres, t_norme, s_norme)
+        for k, conclusion in enumerate(base.conclusions):
+            np.testing.assert_allclose(obtenues[..., k], attendues.get(conclusion, 0.0), rtol=0, atol=1e-12)
+
+
+def degres_trapezes(rng, labels, lignes:int=200):
+    # partitions en trapèzes qui se chevauchent deux à deux : au plus 2 labels voisins actifs par entrée
+    degres = []
+    for labels_entree in labels:
+        position = rng.random(lignes) * (len(labels_entree) - 1)
+        gauche = np.minimum(position.astype(int), len(labels_entree) - 2)
+        degre = np.zeros((lignes, len(labels_entree)))
+        degre[np.arange(lignes), gauche] = 1 - (position - gauche)
+        degre[np.arange(lignes), gauche + 1] = position - gauche
+        degres.append(degre)
+    return degres
+
+
+@pytest.mark.parametrize("s_norme", ["somme probabiliste", "somme bornée"])
+@pytest.mark.parametrize("n_entrees", [4, 5])
+def test_base_creuse_autres_s_normes(n_entrees, s_norme):
+    # peu de règles, surtout des jokers, et une conclusion par défaut qui couvre presque tout l'espace des entrées
+    rng = np.random.default_rng(n_entrees)
+    noms = [f"E{i}" for i in range(n_entrees)]
+    labels = [[f"l{j}" for j in range(int(rng.integers(4, 6)))] for _ in noms]
+    regles = {}
+    for _ in range(12):
+        conditions = tuple((nom, str(rng.choice(labels_entree))) for nom, labels_entree in zip(noms, labels) if rng.random() < 0.4)
+        regles[conditions] = str(rng.choice(["A", "B", "C"]))
+    base = BaseRegles(noms, labels, regles, "D")
+    degres = degres_trapezes(rng, labels)
+
+    obtenues = base.activer(degres, np.multiply, s_norme=S_NORMES[s_norme])
+    attendues = activations_denses(noms, labels, regles, "D", degres, np.multiply, s_norme)
+    for k, conclusion in enumerate(base.conclusions):
+        np.testing.assert_allclose(obtenues[..., k], attendues.get(conclusion, 0.0), rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("s_norme, attendue", [("somme probabiliste", 0.75), ("somme bornée", 1.0)])
+def test_defaut_somme_des_combinaisons(s_norme, attendue):
+    # D couvre (b, x) et (b, y) : 0.5 et 0.5 réunis, et non le max 0.5
+    base = BaseRegles(["E0", "E1"], [["a", "b"], ["x", "y"]], {(("E0", "a"),): "C"}, "D")
+    activations = base.activer([np.array([0.0, 1.0]), np.array([0.5, 0.5])], np.multiply, s_norme=S_NORMES[s_norme])
+    assert activations[base.conclusions.index("D")] == pytest.approx(attendue)
+
+
+@pytest.mark.parametrize("n_categorielles", [1, 2])
+def test_categorielle_comme_un_parmi_n(n_categorielles):
+    rng = np.random.default_rng(1)
+    for _ in range(100):
+        noms, labels, regles = base_aleatoire(rng, complete=False)
+        base = BaseRegles(noms, labels, regles, "D")
+        degres = degres_aleatoires(rng, labels)
+        # codes mélangés dans le lot, ou un seul code
+        lignes = len(degres[0]) if rng.random() < 0.8 else 1
+        codes = [rng.integers(0, len(labels[i]), lignes) for i in range(n_categorielles)]
+
+        un_parmi_n = base.activer([np.eye(len(labels[i]))[c] for i, c in enumerate(codes)] + degres[n_categorielles:])
+        par_code = base.activer(codes + degres[n_categorielles:], categorielles=noms[:n_categorielles])
+        np.testing.assert_array_equal(par_code, np.broadcast_to(un_parmi_n, par_code.shape))
+
+
+def test_nan_propage():
+    base = BaseRegles(["E0", "E1"], [["a", "b"], ["x", "y"]], {(("E0", "a"),): "A"}, "D")
+    # seules les règles qui utilisent le degré NaN valent NaN
+    activations = base.activer([np.array([np.nan, 0.5]), np.array([1.0, 0.0])])
+    assert np.isnan(activations[base.conclusions.index("A")])
+    assert activations[base.conclusions.index("D")] == 0.5
+
+
+def test_base_incomplete_sans_defaut():
+    with pytest.raises(ValueError, match="ne couvrent pas"):
+        BaseRegles(["E0", "E1"], [["a", "b"], ["x", "y"]], {(("E0", "a"),): "A"})
+
+
+def test_label_inconnu():
+    with pytest.raises(ValueError, match="label inconnu"):
+        BaseRegles(["E0"], [["a", "b"]], {(("E0", "c"),): "A"})
+
+
+@pytest.mark.parametrize("cle, entrees", [("regles SIF Conditions Biologiques", ("Masse grasse", "IMC")),
+                                          ("regles SIF Intensité Possible", ("Santé", "Apports caloriques"))])
+def test_systeme_flou_comme_boucle(cle, entrees):
+    d = entrees_regles()
+    rng = np.random.default_rng(1)
+    for nom in entrees:
+        univers = d[nom].univers
+        d[nom].entree_nette = rng.uniform(univers[0], univers[-1], 500)
+
+    obtenues = SystemeFlou([d[nom] for nom in entrees], d[cle]).activation_regles()
+
+    # boucle d'origine de SystemeFlou : min des conditions de chaque règle, max des règles de meme conclusion
+    floues = {d[nom].nom: d[nom].entree_floue for nom in entrees}
+    attendues = {}
+    for conditions, conclusion in d[cle].items():
+        activation = np.minimum.reduce([floues[entree][label] for entree, label in conditions])
+        attendues[conclusion] = np.maximum(attendues.get(conclusion, 0), activation)
+    assert obtenues.keys() == attendues.keys()
+    for conclusion, activation in attendues.items():
+        np.testing.assert_array_equal(obtenues[conclusion], activation)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from Renforcement_musculaire_SY10 import calcul_maintenance, calculer_macronutriments, generer_programme
+from calculs_lot import (NIVEAUX, macronutriments_lot, macronutriments_profil, maintenance_lot, maintenance_profil,
+                         programme_lot, programme_profil)
+
+
+# Les calculs de calculs_lot (par lot et pour un profil) donnent exactement les résultats des fonctions de main()
+
+
+def decoder(parties, niveaux, noms):
+    return ["Repos" if partie < 0 else f"Séance {noms[partie]} ({NIVEAUX[niveau]})" for partie, niveau in zip(parties, niveaux)]
+
+
+def test_maintenance_comme_calcul_maintenance():
+    rng = np.random.default_rng(1)
+    taille, poids, age = rng.uniform(140, 210, 200), rng.uniform(40, 150, 200), rng.integers(15, 80, 200)
+    # activité 5 : hors des niveaux, le métabolisme n'est pas multiplié
+    sexe, activite = rng.choice(["M", "F"], 200), rng.integers(1, 6, 200)
+    attendu = [calcul_maintenance(*profil) for profil in zip(taille, poids, age, sexe, activite)]
+    np.testing.assert_array_equal(maintenance_lot(taille, poids, age, sexe, activite), attendu)
+    obtenu = [maintenance_profil(float(t), float(p), float(a), str(s), int(n)) for t, p, a, s, n in zip(taille, poids, age, sexe, activite)]
+    assert obtenu == attendu
+
+
+def test_sexe_invalide():
+    with pytest.raises(ValueError, match="sexe"):
+        maintenance_lot([170], [70], [30], ["X"], [1])
+    with pytest.raises(ValueError, match="sexe"):
+        maintenance_profil(170.0, 70.0, 30.0, "X", 1)
+
+
+def test_macronutriments_comme_calculer_macronutriments():
+    calories = np.random.default_rng(2).uniform(1000, 4500, 200)
+    obtenus = macronutriments_lot(calories)
+    for i, valeur in enumerate(calories):
+        attendu = calculer_macronutriments(valeur)
+        assert {cle: int(grammes[i]) for cle, grammes in obtenus.items()} == attendu
+        assert macronutriments_profil(float(valeur)) == attendu
+    assert macronutriments_profil(float("nan")) == {cle: 0 for cle in obtenus}
+
+
+@pytest.mark.parametrize("n_parties, jours, seances", [(4, 6, 2), (1, 6, 2), (7, 5, 1), (12, 10, 3)])
+def test_programme_profil_comme_generer_programme(n_parties, jours, seances):
+    rng = np.random.default_rng(0)
+    noms = [f"P{i}" for i in range(n_parties)]
+    # intensités entières pour avoir des égalités (tri stable) et des valeurs sur les seuils
+    intensites = rng.integers(0, 31, (300, n_parties)).astype(float)
+    intensites[:100] += rng.random((100, n_parties))
+
+    for ligne in intensites:
+        parties, niveaux = programme_profil(ligne.tolist(), jours, seances)
+        assert decoder(parties, niveaux, noms) == generer_programme(dict(zip(noms, ligne)), jours, seances)
+
+
+# 200 parties : des indices de parties au dela de 127
+@pytest.mark.parametrize("n_parties, jours, seances", [(4, 6, 2), (1, 6, 2), (7, 5, 1), (12, 10, 3), (200, 40, 1)])
+def test_programme_comme_generer_programme(n_parties, jours, seances):
+    rng = np.random.default_rng(0)
+    noms = [f"P{i}" for i in range(n_parties)]
+    # intensités entières pour avoir des égalités (tri stable) et des valeurs sur les seuils
+    intensites = rng.integers(0, 31, (500, n_parties)).astype(float)
+    intensites[:100] += rng.random((100, n_parties))
+
+    parties, niveaux = programme_lot(intensites, jours, seances)
+    for i, ligne in enumerate(intensites):
+        attendu = generer_programme(dict(zip(noms, ligne)), jours, seances)
+        assert decoder(parties[i], niveaux[i], noms) == attendu
+    if n_parties > 128:
+        assert parties.max() > 127
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from export_arrow import ecrire_arrow, vers_record_batch
+from moteur_vectorise import MoteurVectorise, echantillonner_profils
+
+
+# Les lignes non valides sont nulles dans toutes les colonnes, les colonnes par partie suivent les parties du moteur
+
+
+def test_lignes_non_valides_nulles():
+    moteur = MoteurVectorise()
+    resultats = moteur.evaluer(echantillonner_profils(200, moteur, graine=0))
+    valide = resultats["Valide"]
+    assert valide.any() and not valide.all()
+
+    batch = vers_record_batch(resultats)
+    for nom in ("Apports caloriques", "Glucides (g)", "Intensités réelles", "Programme parties", "Programme niveaux"):
+        np.testing.assert_array_equal(batch.column(nom).is_valid().to_numpy(zero_copy_only=False), valide)
+    # les valeurs des lignes valides sont celles des résultats
+    intensites = batch.column("Intensités réelles").filter(pa.array(valide)).flatten().to_numpy(zero_copy_only=False)
+    np.testing.assert_array_equal(intensites, resultats["Intensités réelles"][valide].reshape(-1))
+    assert batch.column("Danger").null_count == 0
+
+
+@pytest.fixture(scope="module")
+def moteur_12_parties():
+    return MoteurVectorise(parties=[f"G{i}" for i in range(12)])
+
+
+def test_parties_deduites_des_resultats(moteur_12_parties, tmp_path):
+    resultats = moteur_12_parties.evaluer(echantillonner_profils(10, moteur_12_parties, graine=0))
+    batch = vers_record_batch(resultats)
+    assert batch.schema.field("Intensités réelles").type.list_size == 12
+    np.testing.assert_array_equal(batch.column("Intensités réelles").flatten().to_numpy(zero_copy_only=False),
+                                  resultats["Intensités réelles"].reshape(-1))
+
+    ecrire_arrow([resultats], str(tmp_path / "lots.arrow"), moteur_12_parties.parties)
+    with pa.ipc.open_file(str(tmp_path / "lots.arrow")) as lecteur:
+        assert lecteur.read_all().num_rows == 10
+
+
+def test_parties_incoherentes(moteur_12_parties):
+    resultats = moteur_12_parties.evaluer(echantillonner_profils(5, moteur_12_parties, graine=0))
+    with pytest.raises(ValueError, match="12 parties"):
+        vers_record_batch(resultats, ("Bras", "Jambes", "Dos", "Torse"))
+
+
+def test_plus_de_127_parties():
+    moteur = MoteurVectorise(parties=[f"G{i}" for i in range(200)], jours=30, seances_max=1)
+    resultats = moteur.evaluer(echantillonner_profils(20, moteur, graine=1))
+    assert resultats["Programme parties"].max() > 127
+
+    batch = vers_record_batch(resultats, moteur.parties)
+    parties = batch.column("Programme parties").filter(pa.array(resultats["Valide"])).flatten().to_numpy()
+    np.testing.assert_array_equal(parties, resultats["Programme parties"][resultats["Valide"]].reshape(-1))
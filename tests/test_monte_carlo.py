@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from calculs_lot import NIVEAUX
+from monte_carlo import BRUITS, propager_incertitude
+from moteur_vectorise import MoteurVectorise, echantillonner_profils
+
+
+# La propagation Monte Carlo redonne le moteur sans bruit, et les tirages passent par toute la chaine (IMC compris)
+
+
+@pytest.fixture(scope="module")
+def moteur():
+    return MoteurVectorise()
+
+
+@pytest.fixture(scope="module")
+def profils(moteur):
+    profils = echantillonner_profils(40, moteur, graine=0)
+    # l'IMC est recalculé à partir du poids et de la taille
+    del profils["IMC"]
+    return profils
+
+
+def test_sans_bruit_comme_evaluer(moteur, profils):
+    resultats = moteur.evaluer(profils)
+    bandes = propager_incertitude(profils, {cle: 0.0 for cle in BRUITS}, n_echantillons=20, taille_bloc=8, moteur=moteur, graine=0)
+
+    valide = resultats["Valide"]
+    assert valide.any() and not valide.all()
+    np.testing.assert_array_equal(bandes["Probabilité non valide"], ~valide)
+    for nom in ("Apports caloriques", "Intensités réelles"):
+        # tous les percentiles sont la valeur du moteur, NaN pour les clients non valides
+        np.testing.assert_array_equal(bandes[nom], np.repeat(resultats[nom][..., None], 3, axis=-1))
+
+
+def test_probabilites_niveaux(moteur, profils):
+    bandes = propager_incertitude(profils, n_echantillons=300, taille_bloc=100, moteur=moteur, graine=1)
+    probabilites = bandes["Probabilités niveaux"]
+    assert probabilites.shape == (40, len(moteur.parties), len(NIVEAUX))
+
+    valides = bandes["Probabilité non valide"] < 1
+    np.testing.assert_allclose(probabilites[valides].sum(axis=-1), 1.0)
+    assert np.isnan(probabilites[~valides]).all()
+
+
+def test_imc_des_tirages_calcule_avec_le_poids_bruite(moteur, profils):
+    n = 200
+    bandes = propager_incertitude(profils, {"Poids": 15.0}, n_echantillons=n, taille_bloc=n, moteur=moteur, graine=2)
+
+    # memes tirages à la main : le poids bruité (borné) change la maintenance et l'IMC vu par les Conditions
+    rng = np.random.default_rng(2)
+    tirages = {cle: np.asarray(valeur)[None] for cle, valeur in profils.items()}
+    tirages["Poids"] = np.clip(profils["Poids"] + 15.0 * rng.standard_normal((n, 40)), 20.0, 350.0)
+    attendus = moteur.evaluer(tirages)
+    np.testing.assert_array_equal(bandes["Probabilité danger"], attendus["Danger"].mean(axis=0))
+    np.testing.assert_array_equal(bandes["Probabilité non valide"], 1 - attendus["Valide"].mean(axis=0))
@@ -0,0 +1,109 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from Renforcement_musculaire_SY10 import (Entree_floue, SystemeFlou, calcul_maintenance, entrees_regles, generer_programme,
+                                          trouver_maximum_prioritaire_alpha)
+from calculs_lot import NIVEAUX, PARTIES
+from moteur_vectorise import MoteurVectorise
+
+
+# Le moteur vectorisé redonne la chaine de main(), déroulée ici partie par partie avec SystemeFlou
+
+
+def chaine_main(profil:dict):
+    """
+    Chaine de main() pour un profil, partie par partie.
+
+    Returns:
+        tuple: (apports caloriques, intensités réelles par partie, programme) ou None là où main() s'arrete.
+    """
+    d = entrees_regles()
+    d["Masse grasse"].entree_nette = profil["Masse grasse"]
+    maintenance = calcul_maintenance(profil["Taille"], profil["Poids"], profil["Age"], profil["Sexe"], profil["Activité"])
+    d["IMC"].entree_nette = profil["Poids"] / (profil["Taille"] / 100) ** 2
+    conditions = SystemeFlou([d["Masse grasse"], d["IMC"]], d["regles SIF Conditions Biologiques"]).sortie_floue_normalisée("Conditions")
+
+    objectifs = {}
+    for partie, valeur in zip(PARTIES, profil["Objectifs"]):
+        d["Objectif Musculaire"].entree_nette = valeur
+        objectif = Entree_floue("Objectif", list(d["Objectif Musculaire"].entree_floue), list(d["Objectif Musculaire"].entree_floue.values()))
+        objectif.normaliser()
+        objectifs[partie] = objectif
+    maximum = trouver_maximum_prioritaire_alpha({partie: objectif.entree_floue for partie, objectif in objectifs.items()},
+                                                ["gros gain", "gain modéré", "inchangé", "perte"], alpha=0.3)
+    partition = ["perte", "inchangé", "gain modéré", "gros gain"]
+    objectif_max = Entree_floue("Objectif Musculaire Maximum", partition)
+    objectif_max.entree_floue = [1 if categorie == maximum else 0 for categorie in partition]
+
+    d["Objectif Masse Grasse"].entree_nette = profil["Objectif Masse Grasse"]
+    objectif_mg = Entree_floue("Objectif MG", list(d["Objectif Masse Grasse"].entree_floue), list(d["Objectif Masse Grasse"].entree_floue.values()))
+    objectif_mg.normaliser()
+
+    nutrition_1 = SystemeFlou([conditions, objectif_max], d["regles SIF Nutrition 1"]).sortie_floue_non_normalisée("Nutrition Provisoire")
+    if nutrition_1.entree_floue.get("DANGER", 0) > 0:
+        return None
+    nutrition_2 = SystemeFlou([nutrition_1, objectif_mg], d["regles SIF Nutrition 2"]).sortie_floue_normalisée("Apports caloriques")
+    if nutrition_2.entree_floue.get("DANGER", 0) > 0:
+        return None
+    d["Apports caloriques"].entree_nette = maintenance + nutrition_2.defuzzification([-500, -400, -200, 0, 200, 400], 1)
+    d["Impact du dopage"].entree_nette = profil["Répondance"] if profil["Dopage"] else 0
+
+    intensites = {}
+    for partie, genetique, objectif, sante in zip(PARTIES, profil["Génétiques"], objectifs.values(), profil["Santés"]):
+        d["Génétique"].entree_nette = genetique
+        intermediaire = SystemeFlou([d["Génétique"], objectif], d["regles SIF Intensité Nécessaire 1"]) \
+            .sortie_floue_non_normalisée("Intensité nécessaire intermédiaire")
+        necessaire = SystemeFlou([d["Impact du dopage"], intermediaire], d["regles SIF Intensité Nécessaire 2"]).sortie_floue_normalisée("Intensité nécessaire")
+        d["Santé"].entree_nette = sante
+        possible = SystemeFlou([d["Santé"], d["Apports caloriques"]], d["regles SIF Intensité Possible"]).sortie_floue_normalisée("Intensité possible")
+        intensites[partie] = min(possible.defuzzification([20, 25, 30, 15, 5, 10], gamma=1), necessaire.defuzzification([5, 10, 15, 20, 25, 30], gamma=1))
+    return d["Apports caloriques"].entree_nette, intensites, generer_programme(intensites)
+
+
+def profils_aleatoires(n:int, rng):
+    return {
+        "Masse grasse": rng.uniform(0.07, 0.25, n),
+        "Age": rng.integers(16, 70, n),
+        "Taille": rng.uniform(150, 200, n),
+        "Sexe": rng.choice(["M", "F"], n),
+        "Poids": rng.uniform(45, 130, n),
+        "Activité": rng.integers(1, 5, n),
+        "Objectif Masse Grasse": rng.uniform(0.07, 0.25, n),
+        "Dopage": rng.integers(0, 2, n).astype(bool),
+        "Répondance": rng.integers(0, 4, n),
+        "Objectifs": rng.uniform(-0.3, 1, (n, len(PARTIES))),
+        "Génétiques": rng.integers(0, 5, (n, len(PARTIES))),
+        "Santés": rng.uniform(0, 1, (n, len(PARTIES))),
+    }
+
+
+def test_moteur_comme_main():
+    profils = profils_aleatoires(80, np.random.default_rng(0))
+    resultats = MoteurVectorise().evaluer(profils)
+
+    valides = 0
+    for i in range(80):
+        profil = {cle: valeur[i] for cle, valeur in profils.items()}
+        # main() affiche ses étapes, on ne garde que le résultat
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                attendu = chaine_main(profil)
+            except (ValueError, ZeroDivisionError):
+                attendu = None
+        if attendu is None:
+            assert not resultats["Valide"][i]
+            continue
+
+        valides += 1
+        apports, intensites, programme = attendu
+        assert resultats["Valide"][i]
+        assert resultats["Apports caloriques"][i] == pytest.approx(apports, abs=1e-9)
+        np.testing.assert_allclose(resultats["Intensités réelles"][i], [intensites[partie] for partie in PARTIES])
+        obtenu = ["Repos" if partie < 0 else f"Séance {PARTIES[partie]} ({NIVEAUX[niveau]})"
+                  for partie, niveau in zip(resultats["Programme parties"][i], resultats["Programme niveaux"][i])]
+        assert obtenu == programme
+    # l'échantillon doit contenir assez de profils qui vont au bout de la chaine
+    assert valides > 40
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from normes import S_NORMES, T_NORMES, choisir_norme
+
+
+# Noyaux des t-normes contre leur forme fermée, aux bornes 0 et 1 et avec des NaN
+
+DEGRES = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+
+FORMES_FERMEES = {
+    "lukasiewicz": lambda a, b: max(a + b - 1, 0.0),
+    "hamacher": lambda a, b: 0.0 if a == b == 0 else a * b / (a + b - a * b),
+    "einstein": lambda a, b: a * b / (1 + (1 - a) * (1 - b)),
+}
+
+
+@pytest.mark.parametrize("nom", FORMES_FERMEES)
+def test_forme_fermee(nom):
+    a, b = np.meshgrid(DEGRES, DEGRES)
+    obtenues = T_NORMES[nom](a, b)
+    attendues = np.vectorize(FORMES_FERMEES[nom])(a, b)
+    np.testing.assert_allclose(obtenues, attendues, rtol=1e-15, atol=0)
+
+
+@pytest.mark.parametrize("nom", T_NORMES)
+def test_bornes(nom):
+    # 1 est l'élément neutre et 0 l'élément absorbant de toute t-norme
+    t_norme = T_NORMES[nom]
+    np.testing.assert_allclose(t_norme(DEGRES, np.ones_like(DEGRES)), DEGRES, rtol=1e-15, atol=0)
+    np.testing.assert_array_equal(t_norme(DEGRES, np.zeros_like(DEGRES)), 0.0)
+    np.testing.assert_allclose(t_norme(DEGRES[:, None], DEGRES), t_norme(DEGRES, DEGRES[:, None]), rtol=1e-15, atol=0)
+
+
+@pytest.mark.parametrize("nom", T_NORMES)
+def test_nan_propage_t_norme(nom):
+    with np.errstate(invalid="ignore"):
+        assert np.isnan(T_NORMES[nom](DEGRES, np.nan)).all()
+
+
+@pytest.mark.parametrize("nom", S_NORMES)
+def test_nan_propage_s_norme(nom):
+    activations = np.array([[0.2, np.nan, 0.4, 0.1], [0.0, 0.0, 0.0, 0.0]])
+    reunies = S_NORMES[nom](activations, np.array([0, 2]))
+    assert np.isnan(reunies[0, 0]) and not np.isnan(reunies[0, 1])
+    np.testing.assert_array_equal(reunies[1], 0.0)
+
+
+def test_norme_inconnue():
+    assert choisir_norme(T_NORMES, "einstein") is T_NORMES["einstein"]
+    with pytest.raises(ValueError, match="Norme inconnue"):
+        choisir_norme(S_NORMES, "min")
@@ -0,0 +1,134 @@
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from moteur_vectorise import echantillonner_profils
+from registre_modeles import RegistreModeles, compiler_definition
+
+
+# Le registre sert chaque version par son moteur compilé une seule fois, ne publie que des versions qui s'évaluent,
+# et un mauvais fichier n'arrete jamais le rechargement
+
+
+def ecrire(dossier, nom:str, definition:dict):
+    chemin = os.path.join(dossier, nom)
+    with open(chemin + ".tmp", "w", encoding="utf-8") as fichier:
+        json.dump(definition, fichier, ensure_ascii=False)
+    os.replace(chemin + ".tmp", chemin)
+
+
+# décalage de toutes les valeurs nutrition, qui décale d'autant les apports caloriques
+def definition_decalee(decalage:float):
+    return {"valeurs regression": {"valeurs nutrition": [x + decalage for x in (-500, -400, -200, 0, 200, 400)]}}
+
+
+def test_modification_change_le_moteur_de_la_version(tmp_path):
+    ecrire(tmp_path, "a.json", definition_decalee(0))
+    ecrire(tmp_path, "b.json", definition_decalee(0))
+    registre = RegistreModeles(str(tmp_path))
+    profils = echantillonner_profils(50, registre.moteur("a"), graine=0)
+    avant = registre.evaluer("a", profils)
+
+    ecrire(tmp_path, "a.json", definition_decalee(100))
+    assert registre.recharger() == {"a": "modifiée"}
+    apres = registre.evaluer("a", profils)
+    valides = avant["Valide"] & apres["Valide"]
+    assert valides.any()
+    np.testing.assert_allclose(apres["Apports caloriques"][valides], avant["Apports caloriques"][valides] + 100)
+    # l'autre version n'a pas changé
+    np.testing.assert_array_equal(registre.evaluer("b", profils)["Apports caloriques"], avant["Apports caloriques"])
+
+
+def test_contenus_identiques_partagent_le_moteur(tmp_path):
+    ecrire(tmp_path, "a.json", definition_decalee(50))
+    ecrire(tmp_path, "b.json", definition_decalee(50))
+    # meme contenu sous un autre identifiant de version
+    ecrire(tmp_path, "c.json", dict(definition_decalee(50), version="salle-lyon"))
+    ecrire(tmp_path, "d.json", definition_decalee(0))
+    registre = RegistreModeles(str(tmp_path))
+    assert registre.versions() == ["a", "b", "d", "salle-lyon"]
+    assert registre.moteur("a") is registre.moteur("b") is registre.moteur("salle-lyon")
+    assert registre.moteur("d") is not registre.moteur("a")
+
+    # un rechargement sans changement ne recompile rien
+    moteur = registre.moteur("a")
+    assert registre.recharger() == {}
+    assert registre.moteur("a") is moteur
+
+
+def test_moteur_pris_avant_rechargement(tmp_path):
+    ecrire(tmp_path, "a.json", definition_decalee(0))
+    registre = RegistreModeles(str(tmp_path))
+    ancien = registre.moteur("a")
+    profils = echantillonner_profils(50, ancien, graine=1)
+    attendu = ancien.evaluer(profils)
+
+    ecrire(tmp_path, "a.json", definition_decalee(200))
+    registre.recharger()
+    assert registre.moteur("a") is not ancien
+    # une évaluation qui a pris le moteur avant le rechargement le garde, meme après la suppression de la version
+    os.remove(tmp_path / "a.json")
+    assert registre.recharger() == {"a": "supprimée"}
+    with pytest.raises(KeyError, match="inconnue"):
+        registre.moteur("a")
+    np.testing.assert_array_equal(ancien.evaluer(profils)["Apports caloriques"], attendu["Apports caloriques"])
+
+
+@pytest.mark.parametrize("entrees", [
+    {"IMC": {"univers": [10, 50, 1]}},
+    {"IMC": {"univers": [50, 10, 100]}},
+    {"IMC": {"partition": {"sous poids": [0, 18.5, 20]}}},
+    {"IMC": {"partition": {"sous poids": [0, 20, 18.5, 25]}}},
+])
+def test_entrees_invalides_refusees(entrees):
+    with pytest.raises(ValueError):
+        compiler_definition({"entrees": entrees})
+
+
+def test_modele_sans_resultat_valide_refuse():
+    # des valeurs de régression non définies rendent toutes les intensités invalides
+    with pytest.raises(ValueError, match="profils de contrôle"):
+        compiler_definition({"valeurs regression": {"valeurs intensité nécessaire": [float("nan")] * 6}})
+
+
+def test_fichier_invalide_garde_les_autres(tmp_path):
+    ecrire(tmp_path, "a.json", {})
+    registre = RegistreModeles(str(tmp_path))
+    assert registre.versions() == ["a"]
+
+    # un trapèze de 3 coordonnées, qui ferait échouer skfuzzy plus loin
+    ecrire(tmp_path, "b.json", {"entrees": {"IMC": {"partition": {"sous poids": [0, 18.5, 20]}}}})
+    ecrire(tmp_path, "c.json", {"programme": {"jours": 5}})
+    registre.recharger()
+    assert registre.versions() == ["a", "c"]
+    assert str(tmp_path / "b.json") in registre.erreurs
+
+
+def test_surveillance_survit_a_un_echec(tmp_path, monkeypatch):
+    ecrire(tmp_path, "a.json", {})
+    registre = RegistreModeles(str(tmp_path))
+
+    # le premier rechargement de la surveillance échoue
+    recharger = registre.recharger
+    echecs = []
+
+    def recharger_une_fois_en_echec():
+        if not echecs:
+            echecs.append(True)
+            raise RuntimeError("échec")
+        return recharger()
+
+    monkeypatch.setattr(registre, "recharger", recharger_une_fois_en_echec)
+    registre.surveiller(intervalle=0.05)
+    try:
+        ecrire(tmp_path, "d.json", {})
+        limite = time.monotonic() + 30
+        while "d" not in registre.versions() and time.monotonic() < limite:
+            time.sleep(0.05)
+        assert "d" in registre.versions()
+        assert registre._surveillance[0].is_alive()
+    finally:
+        registre.arreter()
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from calculs_lot import UNIVERS
+from moteur_vectorise import MoteurVectorise, echantillonner_profils
+from simulation import ENTREES_ETAPES, evolution_lineaire, simuler
+
+
+# Les recalculs incrémentaux de simuler donnent chaque semaine les résultats du moteur sur tout l'état de la semaine
+
+
+CLIENTS = 400
+SEMAINES = 8
+
+
+@pytest.fixture(scope="module")
+def moteur():
+    return MoteurVectorise()
+
+
+@pytest.fixture(scope="module")
+def profils(moteur):
+    profils = echantillonner_profils(CLIENTS, moteur, graine=0)
+    del profils["IMC"]
+    return profils
+
+
+# états successifs tels que simuler les construit : évolution, retour dans les univers, IMC recalculé
+def etats_semaines(moteur, profils:dict, evolution, semaines:int):
+    etat = {cle: np.array(valeur) for cle, valeur in profils.items()}
+    for semaine in range(semaines):
+        if semaine > 0:
+            etat = {cle: np.array(valeur) for cle, valeur in evolution(semaine, etat).items()}
+        for cle, nom in UNIVERS.items():
+            if cle in etat and cle != "IMC":
+                etat[cle] = np.clip(etat[cle], moteur.d[nom].univers[0], moteur.d[nom].univers[-1])
+        etat["IMC"] = etat["Poids"] / (etat["Taille"] / 100) ** 2
+        yield etat
+
+
+def verifier_comme_evaluer(moteur, profils:dict, evolution, series:dict):
+    for semaine, etat in enumerate(etats_semaines(moteur, profils, evolution, SEMAINES)):
+        attendus = moteur.evaluer(etat)
+        for cle in ("Apports caloriques", "Intensités réelles", "Programme parties", "Programme niveaux", "Valide"):
+            np.testing.assert_array_equal(series[cle][:, semaine], attendus[cle].astype(series[cle].dtype),
+                                          err_msg=f"semaine {semaine}, {cle}")
+
+
+def test_simuler_comme_evaluer(moteur, profils):
+    rng = np.random.default_rng(1)
+    # dérives par client et par partie, certains clients ne changent pas certaines entrées
+    derives = {
+        "Masse grasse": np.where(rng.random(CLIENTS) < 0.5, -0.004, 0.0),
+        "Poids": rng.normal(0, 0.8, CLIENTS),
+        "Santés": np.where(rng.random((CLIENTS, 4)) < 0.3, 0.05, 0.0),
+        "Objectifs": np.where(rng.random((CLIENTS, 4)) < 0.3, -0.05, 0.0),
+    }
+    evolution = evolution_lineaire(derives)
+    series = simuler(profils, evolution, SEMAINES, moteur)
+    verifier_comme_evaluer(moteur, profils, evolution, series)
+
+
+def test_evolution_sur_place(moteur, profils):
+    # l'évolution modifie l'état qu'elle reçoit au lieu d'en construire un nouveau
+    def evolution(semaine, etat):
+        etat["Masse grasse"] -= 0.003
+        etat["Santés"][::3] += 0.04
+        return etat
+
+    series = simuler(profils, evolution, SEMAINES, moteur)
+    verifier_comme_evaluer(moteur, profils, evolution, series)
+    # les profils donnés ne sont pas modifiés
+    np.testing.assert_array_equal(profils["Masse grasse"], echantillonner_profils(CLIENTS, moteur, graine=0)["Masse grasse"])
+
+
+def test_recalculs_seulement_des_entrees_modifiees(moteur, profils):
+    series = simuler(profils, lambda semaine, etat: etat, SEMAINES, moteur)
+    # rien ne change après la premiere semaine
+    assert series["Recalculs"] == {etape: CLIENTS for etape in ENTREES_ETAPES}
+
+    # seule la santé d'un client sur quatre change chaque semaine
+    derives = {"Santés": np.where(np.arange(CLIENTS)[:, None] % 4 == 0, 0.01, 0.0)}
+    series = simuler(profils, evolution_lineaire(derives), SEMAINES, moteur)
+    recalculs = series["Recalculs"]
+    assert recalculs["intensité possible"] == CLIENTS + (SEMAINES - 1) * CLIENTS // 4
+    assert all(recalculs[etape] == CLIENTS for etape in ENTREES_ETAPES if etape != "intensité possible")
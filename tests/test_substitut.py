@@ -0,0 +1,105 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from moteur_vectorise import MoteurVectorise, echantillonner_profils
+from substitut import ModeleSubstitut, certifier, distiller
+
+
+# Le chemin d'un profil seul redonne le chemin par lot au bit près, le rapport de certification est celui
+# des résultats des deux modèles, et un substitut enregistré se recharge et s'évalue sans skfuzzy
+
+
+@pytest.fixture(scope="module")
+def substitut():
+    modele, rapport = distiller(points_par_axe=16, n_certification=500, graine=1)
+    return modele
+
+
+@pytest.fixture(scope="module")
+def profils():
+    return echantillonner_profils(3000, graine=2)
+
+
+def test_profil_seul_comme_lot(substitut, profils):
+    lot = substitut.evaluer(profils)
+    assert lot["Valide"].any() and not lot["Valide"].all()
+    for i in range(3000):
+        profil = {cle: valeur[i] for cle, valeur in profils.items()}
+        # l'IMC calculé à partir du poids et de la taille pour une partie des profils
+        if i % 2:
+            del profil["IMC"]
+            attendu = substitut.evaluer({cle: valeur[i:i + 1] for cle, valeur in profils.items() if cle != "IMC"})
+            attendu = {cle: valeur[0] for cle, valeur in attendu.items()}
+        else:
+            attendu = {cle: valeur[i] for cle, valeur in lot.items()}
+        obtenu = substitut.evaluer(profil)
+        assert obtenu.keys() == attendu.keys()
+        for cle, valeur in attendu.items():
+            np.testing.assert_array_equal(obtenu[cle], valeur, err_msg=f"profil {i}, {cle}")
+
+
+def test_rapport_certification(substitut, profils):
+    from moteur_vectorise import MoteurVectorise, echantillonner_profils
+    from substitut import certifier
+
+    moteur = MoteurVectorise()
+    echantillon = {cle: valeur[:500] for cle, valeur in profils.items()}
+    rapport = certifier(substitut, moteur, echantillon)
+
+    exact, approche = moteur.evaluer(echantillon), substitut.evaluer(echantillon)
+    valides = exact["Valide"] & approche["Valide"]
+    for nom in ("Apports caloriques", "Intensités réelles"):
+        erreurs = np.abs(exact[nom] - approche[nom])[valides]
+        assert rapport[nom]["erreur max"] == erreurs.max()
+        assert rapport[nom]["erreur moyenne"] == pytest.approx(erreurs.mean())
+    assert rapport["désaccord validité"] == (exact["Valide"] != approche["Valide"]).mean()
+    assert rapport["profils"] == 500
+    assert 0 < rapport["latence substitut (µs)"] < rapport["latence moteur (µs)"]
+
+
+def test_enregistrer_charger(substitut, profils, tmp_path):
+    chemin = str(tmp_path / "substitut.npz")
+    substitut.enregistrer(chemin)
+    charge = ModeleSubstitut.charger(chemin)
+
+    assert charge.infos == dict(substitut.infos, axes=list(substitut.axes))
+    for cle, valeur in substitut.evaluer(profils).items():
+        np.testing.assert_array_equal(charge.evaluer(profils)[cle], valeur)
+
+
+def test_sans_skfuzzy_ni_moteur(substitut, profils, tmp_path):
+    chemin = str(tmp_path / "substitut.npz")
+    substitut.enregistrer(chemin)
+    profil = {cle: np.asarray(valeur[0]).tolist() for cle, valeur in profils.items()}
+    attendu = substitut.evaluer(profil)["Apports caloriques"]
+
+    # skfuzzy rendu introuvable dans un interpréteur neuf
+    code = "\n".join([
+        "import json, sys",
+        "sys.modules['skfuzzy'] = None",
+        f"sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.abspath(__file__)))!r})",
+        "from substitut import ModeleSubstitut",
+        f"resultats = ModeleSubstitut.charger({chemin!r}).evaluer(json.loads(sys.argv[1]))",
+        "assert 'moteur_vectorise' not in sys.modules and 'Renforcement_musculaire_SY10' not in sys.modules",
+        "print(repr(float(resultats['Apports caloriques'])))",
+    ])
+    sortie = subprocess.run([sys.executable, "-c", code, json.dumps(profil)], capture_output=True, text=True)
+    assert sortie.returncode == 0, sortie.stderr
+    assert float(sortie.stdout) == attendu or (np.isnan(attendu) and sortie.stdout.strip() == "nan")
+
+
+@pytest.mark.parametrize("code", [7, -1, 1.5, "1", float("nan")])
+def test_codes_invalides(substitut, profils, code):
+    profil = {cle: np.asarray(valeur[0]).tolist() for cle, valeur in profils.items()}
+    profil["Génétiques"] = [0, 1, code, 2]
+    with pytest.raises(ValueError, match="Génétique"):
+        substitut.evaluer(profil)
+    lot = {cle: valeur[:2] for cle, valeur in profils.items()}
+    lot["Génétiques"] = np.array([[0, 1, 2, 3], [0, 1, code, 2]])
+    with pytest.raises(ValueError, match="Génétique"):
+        substitut.evaluer(lot)